@@ -1,6 +1,10 @@
-from flask import Flask
+from flask import Flask, jsonify
 # import blueprints from the api.routes package
-from api.routes import auth, users, menu, orders, admin
+from api.routes import auth, users, menu, orders, admin, metrics
+from api.middleware import query_log, metrics as request_metrics, profiler
+from api.config import Config
+from api.services.concurrency import QueryTimeout
+from api.services.events import TooManySubscribers
 
 # config imports will be resolved when using fully qualified path
 
@@ -9,6 +13,9 @@ def create_app(config_object="api.config.Config"):
     """Application factory for the Flask app."""
     app = Flask(__name__)
     app.config.from_object(config_object)
+    query_log.init_app(app)
+    request_metrics.init_app(app)
+    profiler.init_app(app)
 
     # register blueprints
     app.register_blueprint(auth.bp)
@@ -16,6 +23,18 @@ def create_app(config_object="api.config.Config"):
     app.register_blueprint(menu.bp)
     app.register_blueprint(orders.bp)
     app.register_blueprint(admin.bp)
+    app.register_blueprint(metrics.bp)
+
+    @app.errorhandler(TooManySubscribers)
+    def too_many_subscribers(exc):
+        response = jsonify({'error': 'Too many live connections, try again shortly'})
+        response.headers['Retry-After'] = str(Config.EVENT_RETRY_AFTER)
+        return response, 503
+
+    @app.errorhandler(QueryTimeout)
+    def query_timeout(exc):
+        app.logger.warning('Query timeout: %s', exc)
+        return jsonify({'error': 'The database is slow to respond, try again shortly'}), 503
 
     return app
 
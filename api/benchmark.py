@@ -0,0 +1,388 @@
+"""
+Lunch-Rush Benchmark
+====================
+Drives the real Flask app with a synthetic campus workload and reports
+latency percentiles, throughput and database round-trips per request
+(overall, and per endpoint from the `X-DB-Queries` response header).
+
+The app runs against the in-memory backend (`SUPABASE_BACKEND=memory`)
+with injected per-query latency, so results are repeatable on a laptop or
+in CI and still reflect how many round-trips each endpoint makes.  The
+workload mixes what happens around lunch time:
+
+- browse: students open the stall list, a stall's menu, an item or search;
+- order:  students place an order at one stall (`POST /orders`);
+- poll:   students refresh their order list (`GET /orders`);
+- admin:  admins work the queue: fetch pending orders and approve the
+          oldest, or move approved orders to ready and ready ones to
+          completed with `/admin/orders/bulk`.
+
+Run from the repository root:
+
+    python -m api.benchmark --students 2000 --requests 20000 --output bench.json
+    python -m api.benchmark --baseline bench.json --max-regression 0.2
+
+The JSON result carries the git commit, the settings and per-endpoint
+statistics, so runs from two commits can be compared with `--baseline`.
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from api.config import Config
+
+SCENARIOS = {"browse": 55, "poll": 25, "order": 15, "admin": 5}
+SEARCH_TERMS = ("dosa", "juice", "rice", "coffe", "samosa", "sandwich", "dal", "idli")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Recorder:
+    """Per-endpoint latencies and status codes, shared by the worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}  # label -> [seconds]
+        self.statuses = {}  # label -> {status: count}
+        self.queries = {}  # label -> total X-DB-Queries
+
+    def record(self, label, status, seconds, queries=0):
+        with self._lock:
+            self.samples.setdefault(label, []).append(seconds)
+            self.queries[label] = self.queries.get(label, 0) + queries
+            counts = self.statuses.setdefault(label, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def endpoints(self):
+        report = {}
+        for label in sorted(self.samples):
+            statuses = self.statuses[label]
+            report[label] = {
+                "requests": len(self.samples[label]),
+                "errors": sum(n for status, n in statuses.items() if status >= 500),
+                "statuses": {str(s): n for s, n in sorted(statuses.items())},
+                "db_queries_per_request": round(
+                    self.queries[label] / len(self.samples[label]), 2
+                ),
+                **summarize(self.samples[label]),
+            }
+        return report
+
+
+class Workload:
+    """One simulated lunch rush against a Flask app."""
+
+    def __init__(self, app, db, students, admins, rng):
+        self.app = app
+        self.db = db
+        self.rng = rng
+        self.students = students  # [(user_id, token)]
+        self.admins = admins
+        self.menu = {}  # stall_id -> [item ids]
+        for item in db.tables.get("menu_items", {}).values():
+            if item["is_available"]:
+                self.menu.setdefault(item["stall_id"], []).append(item["id"])
+        self.recorder = Recorder()
+
+    def _call(self, client, label, method, path, token=None, **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        start = time.perf_counter()
+        response = client.open(path, method=method, headers=headers, **kwargs)
+        elapsed = time.perf_counter() - start
+        queries = int(response.headers.get("X-DB-Queries", 0))
+        self.recorder.record(label, response.status_code, elapsed, queries)
+        return response
+
+    def browse(self, client, rng, token):
+        stall_id = rng.choice(list(self.menu))
+        step = rng.random()
+        if step < 0.3:
+            self._call(client, "GET /menu/stalls", "GET", "/menu/stalls")
+        elif step < 0.7:
+            self._call(
+                client, "GET /menu/stalls/<id>/items", "GET", f"/menu/stalls/{stall_id}/items"
+            )
+        elif step < 0.85:
+            item_id = rng.choice(self.menu[stall_id])
+            self._call(client, "GET /menu/items/<id>", "GET", f"/menu/items/{item_id}")
+        else:
+            term = rng.choice(SEARCH_TERMS)
+            self._call(client, "GET /menu/search", "GET", f"/menu/search?q={term}")
+
+    def order(self, client, rng, token):
+        stall_id = rng.choice(list(self.menu))
+        picks = rng.sample(self.menu[stall_id], k=min(len(self.menu[stall_id]), rng.randint(1, 3)))
+        body = {
+            "stall_id": stall_id,
+            "items": [{"menu_item_id": i, "quantity": rng.randint(1, 2)} for i in picks],
+        }
+        self._call(client, "POST /orders", "POST", "/orders", token, json=body)
+
+    def poll(self, client, rng, token):
+        self._call(client, "GET /orders", "GET", "/orders?limit=20", token)
+
+    def admin(self, client, rng, token):
+        token = rng.choice(self.admins)
+        step = rng.random()
+        if step < 0.6:
+            res = self._call(
+                client, "GET /admin/orders/pending", "GET", "/admin/orders/pending", token
+            )
+            pending = res.get_json() or []
+            for order in pending[:3]:
+                self._call(
+                    client,
+                    "POST /admin/orders/<id>/approve",
+                    "POST",
+                    f"/admin/orders/{order['id']}/approve",
+                    token,
+                    json={"estimated_time": rng.randint(5, 20)},
+                )
+            return
+        status, action = ("approved", "ready") if step < 0.8 else ("ready", "complete")
+        res = self._call(
+            client, "GET /admin/orders", "GET", f"/admin/orders?status={status}&limit=20", token
+        )
+        ids = [o["id"] for o in (res.get_json() or {}).get("orders", [])]
+        if ids:
+            self._call(
+                client,
+                "POST /admin/orders/bulk",
+                "POST",
+                "/admin/orders/bulk",
+                token,
+                json={"action": action, "order_ids": ids},
+            )
+
+    def plan(self, count):
+        names = list(SCENARIOS)
+        weights = [SCENARIOS[n] for n in names]
+        return [
+            (self.rng.choices(names, weights)[0], self.rng.randrange(len(self.students)))
+            for _ in range(count)
+        ]
+
+    def run(self, actions, concurrency):
+        """Replay `actions` on `concurrency` threads; returns the wall time."""
+        lock = threading.Lock()
+        queue = iter(actions)
+        seeds = [self.rng.random() for _ in range(concurrency)]
+
+        def worker(seed):
+            rng = random.Random(seed)
+            client = self.app.test_client()
+            while True:
+                with lock:
+                    action = next(queue, None)
+                if action is None:
+                    return
+                scenario, student = action
+                getattr(self, scenario)(client, rng, self.students[student][1])
+
+        threads = [threading.Thread(target=worker, args=(s,)) for s in seeds]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - start
+
+
+def setup(args):
+    """Configure the memory backend and create the app and accounts."""
+    Config.SUPABASE_BACKEND = "memory"
+    Config.SUPABASE_MEMORY_SEED = "demo"
+    Config.MEMORY_LATENCY_MS = args.latency_ms
+    Config.MEMORY_JITTER_MS = args.jitter_ms
+    Config.ORDER_PLACEMENT_MODE = args.placement
+
+    from api.app import create_app
+    from api.services.memory_backend import get_memory_database
+
+    db = get_memory_database()
+    app = create_app()
+
+    def login(email, password, name, role="student"):
+        user_id = db.create_user(email, password, name, role=role)
+        session = db.auth.sign_in_with_password({"email": email, "password": password})
+        return user_id, session["session"]["access_token"]
+
+    students = [
+        login(f"student{i}@campus.test", "password", f"Student {i}") for i in range(args.students)
+    ]
+    admins = [
+        login(f"admin{i}@campus.test", "password", f"Admin {i}", role="admin")[1]
+        for i in range(args.admins)
+    ]
+    return app, db, students, admins
+
+
+def run(args):
+    app, db, students, admins = setup(args)
+    rng = random.Random(args.seed)
+    workload = Workload(app, db, students, admins, rng)
+
+    if args.warmup:
+        workload.run(workload.plan(args.warmup), args.concurrency)
+        workload.recorder = Recorder()
+    db.reset_stats()
+
+    elapsed = workload.run(workload.plan(args.requests), args.concurrency)
+    endpoints = workload.recorder.endpoints()
+    samples = [s for values in workload.recorder.samples.values() for s in values]
+    db_stats = db.stats()
+    total = len(samples)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "settings": {
+                "students": args.students,
+                "admins": args.admins,
+                "requests": args.requests,
+                "warmup": args.warmup,
+                "concurrency": args.concurrency,
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "placement": args.placement,
+                "seed": args.seed,
+            },
+        },
+        "totals": {
+            "requests": total,
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "duration_s": round(elapsed, 3),
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            **summarize(samples),
+            "db_round_trips": db_stats["round_trips"],
+            "db_round_trips_per_request": round(db_stats["round_trips"] / total, 2)
+            if total
+            else 0.0,
+            "db_by_table": db_stats["by_table"],
+        },
+        "endpoints": endpoints,
+    }
+
+
+def compare(result, baseline, max_regression):
+    """Print changes against `baseline`; returns False on a regression.
+
+    A regression is total p95 latency growing, or throughput shrinking, by
+    more than `max_regression` (a fraction).
+    """
+
+    def change(new, old):
+        return (new - old) / old if old else 0.0
+
+    ok = True
+    print(f"\nvs baseline {baseline['meta'].get('commit')}:")
+    print(f"{'endpoint':36} {'p95 ms':>16} {'change':>8}")
+    for label, stats in result["endpoints"].items():
+        old = baseline["endpoints"].get(label)
+        if old:
+            delta = change(stats["p95_ms"], old["p95_ms"])
+            print(f"{label:36} {old['p95_ms']:>7} -> {stats['p95_ms']:<7} {delta:>+8.1%}")
+    totals, old_totals = result["totals"], baseline["totals"]
+    p95 = change(totals["p95_ms"], old_totals["p95_ms"])
+    rps = change(totals["throughput_rps"], old_totals["throughput_rps"])
+    print(f"total p95 {p95:+.1%}, throughput {rps:+.1%}")
+    if max_regression is not None and (p95 > max_regression or -rps > max_regression):
+        print(f"regression above {max_regression:.0%}")
+        ok = False
+    return ok
+
+
+def report(result):
+    totals = result["totals"]
+    print(
+        f"{totals['requests']} requests in {totals['duration_s']}s "
+        f"({totals['throughput_rps']} req/s), {totals['errors']} errors"
+    )
+    print(
+        f"latency p50 {totals['p50_ms']} ms, p95 {totals['p95_ms']} ms, "
+        f"p99 {totals['p99_ms']} ms; "
+        f"{totals['db_round_trips_per_request']} DB round-trips per request"
+    )
+    print(
+        f"\n{'endpoint':36} {'reqs':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'5xx':>5} {'db/req':>7}"
+    )
+    for label, stats in result["endpoints"].items():
+        print(
+            f"{label:36} {stats['requests']:>6} {stats['p50_ms']:>8} "
+            f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['errors']:>5} "
+            f"{stats['db_queries_per_request']:>7}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--admins", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--placement", choices=("rpc", "python"), default="rpc")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare with")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="exit 1 if p95 or throughput is worse than the baseline by this fraction",
+    )
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 
 class Config:
@@ -7,6 +8,127 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "please-set-a-secret")
     SUPABASE_URL = os.environ.get("SUPABASE_URL")
     SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+    # optional split keys; both fall back to SUPABASE_KEY
+    SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
+    SUPABASE_ANON_KEY = os.environ.get("SUPABASE_ANON_KEY")
+    # JWT secret from the Supabase dashboard; enables local token checks
+    SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+    # the project's PostgREST max-rows setting: most rows one query returns
+    SUPABASE_MAX_ROWS = int(os.environ.get("SUPABASE_MAX_ROWS", 1000))
+    # "memory" serves all queries from an in-process stand-in database
+    # (api/services/memory_backend.py) instead of a Supabase project
+    SUPABASE_BACKEND = os.environ.get("SUPABASE_BACKEND", "supabase")
+    # initial data for the memory backend: "demo", a JSON file path, or empty
+    SUPABASE_MEMORY_SEED = os.environ.get("SUPABASE_MEMORY_SEED", "demo")
+    # simulated round-trip per memory backend query: latency + random jitter
+    MEMORY_LATENCY_MS = float(os.environ.get("MEMORY_LATENCY_MS", 0))
+    MEMORY_JITTER_MS = float(os.environ.get("MEMORY_JITTER_MS", 0))
     TELEGRAM_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
+    TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+
+    # background telegram delivery
+    TELEGRAM_WORKERS = int(os.environ.get("TELEGRAM_WORKERS", 4))
+    TELEGRAM_QUEUE_SIZE = int(os.environ.get("TELEGRAM_QUEUE_SIZE", 1000))
+    TELEGRAM_MAX_RETRIES = int(os.environ.get("TELEGRAM_MAX_RETRIES", 5))
+    TELEGRAM_RETRY_BACKOFF = float(os.environ.get("TELEGRAM_RETRY_BACKOFF", 1.0))
+    TELEGRAM_TIMEOUT = float(os.environ.get("TELEGRAM_TIMEOUT", 5.0))
+    # messages per second across all workers (Telegram allows ~30 per bot)
+    TELEGRAM_RATE_LIMIT = float(os.environ.get("TELEGRAM_RATE_LIMIT", 30))
+    # how long the list of admin chat ids is reused before re-querying
+    ADMIN_RECIPIENTS_TTL = float(os.environ.get("ADMIN_RECIPIENTS_TTL", 300))
+
+    # HTTP connection pool per Supabase client (per worker process)
+    SUPABASE_POOL_SIZE = int(os.environ.get("SUPABASE_POOL_SIZE", 20))
+    SUPABASE_KEEPALIVE_CONNECTIONS = int(os.environ.get("SUPABASE_KEEPALIVE_CONNECTIONS", 10))
+    SUPABASE_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_KEEPALIVE_EXPIRY", 30))
+    SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 10))
+    SUPABASE_CONNECT_TIMEOUT = float(os.environ.get("SUPABASE_CONNECT_TIMEOUT", 3))
+
+    # per-request query accounting: X-DB-Queries / Server-Timing headers, and
+    # how often one query shape may repeat in a request before it is logged
+    # as a likely N+1
+    DB_TIMING_HEADERS = os.environ.get("DB_TIMING_HEADERS", "true").lower() == "true"
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5))
+
+    # bearer token required by GET /metrics.  Without one the endpoint is
+    # off, unless METRICS_PUBLIC opens it (only on a private network).
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC", "false").lower() == "true"
+
+    # request profiler: fraction of requests profiled (admins can also ask
+    # with X-Profile: 1), where profiles go, and how many are kept
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_DIR = os.environ.get(
+        "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "food-court-profiles")
+    )
+    PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 50))
+    PROFILE_TOP_FUNCTIONS = int(os.environ.get("PROFILE_TOP_FUNCTIONS", 30))
+
+    # shared pool for running independent Supabase lookups concurrently
+    QUERY_POOL_SIZE = int(os.environ.get("QUERY_POOL_SIZE", 16))
+    # seconds one lookup may run once started; a slower one is a 503
+    QUERY_TIMEOUT = float(os.environ.get("QUERY_TIMEOUT", 10))
+
+    # order listings (keyset pagination)
+    ORDERS_PAGE_SIZE = int(os.environ.get("ORDERS_PAGE_SIZE", 50))
+    ORDERS_MAX_PAGE_SIZE = int(os.environ.get("ORDERS_MAX_PAGE_SIZE", 200))
+    # kept small: each page's ids go into the URL of the `in_()` lookups
+    ORDERS_EXPORT_PAGE_SIZE = int(os.environ.get("ORDERS_EXPORT_PAGE_SIZE", 100))
+    # most orders one POST /admin/orders/bulk request may transition
+    ORDERS_BULK_MAX = int(os.environ.get("ORDERS_BULK_MAX", 100))
+
+    # "rpc" places orders through the place_order database function (one
+    # round-trip, transactional); "python" uses the multi-query path
+    ORDER_PLACEMENT_MODE = os.environ.get("ORDER_PLACEMENT_MODE", "rpc")
+
+    # in-process stock index: how long checkout holds portions, and how often
+    # counts are reloaded to see sales made by other workers
+    STOCK_HOLD_TTL = float(os.environ.get("STOCK_HOLD_TTL", 30))
+    STOCK_REFRESH_TTL = float(os.environ.get("STOCK_REFRESH_TTL", 30))
+
+    # Idempotency-Key support for POST /orders
+    IDEMPOTENCY_STORE = os.environ.get(
+        "IDEMPOTENCY_STORE", "api.services.idempotency.InMemoryIdempotencyStore"
+    )
+    IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 86400))
+    IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", 10000))
+
+    # verified-token cache used by require_auth / require_admin
+    AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", 300))
+    AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 10000))
+    ADMIN_ROLES_TTL = float(os.environ.get("ADMIN_ROLES_TTL", 60))
+    # seconds a single-use SSE stream ticket (POST /auth/stream-ticket) is valid
+    STREAM_TICKET_TTL = float(os.environ.get("STREAM_TICKET_TTL", 30))
+
+    # menu read cache (per worker)
+    MENU_CACHE_TTL = float(os.environ.get("MENU_CACHE_TTL", 300))
+    MENU_CACHE_SIZE = int(os.environ.get("MENU_CACHE_SIZE", 512))
+    # Cache-Control max-age for menu responses; clients revalidate via ETag
+    MENU_HTTP_MAX_AGE = int(os.environ.get("MENU_HTTP_MAX_AGE", 30))
+    # most rows accepted by one /admin/menu/items/bulk request
+    MENU_BULK_MAX_ROWS = int(os.environ.get("MENU_BULK_MAX_ROWS", 500))
+    # in-memory menu search index: background rebuild interval and result cap
+    SEARCH_REFRESH_TTL = float(os.environ.get("SEARCH_REFRESH_TTL", 300))
+    SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", 50))
+
+    # live order events (Server-Sent Events)
+    EVENT_HISTORY_SIZE = int(os.environ.get("EVENT_HISTORY_SIZE", 1000))
+    EVENT_BUFFER_SIZE = int(os.environ.get("EVENT_BUFFER_SIZE", 100))
+    SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT", 15))
+    SSE_MAX_DURATION = float(os.environ.get("SSE_MAX_DURATION", 300))
+    LONG_POLL_TIMEOUT = float(os.environ.get("LONG_POLL_TIMEOUT", 25))
+    # most streams and long-polls open at once per process; more get a 503.
+    # In threaded mode each holds a worker thread, so the default leaves
+    # half of THREADS for other requests.
+    EVENT_SUBSCRIBERS_MAX = int(
+        os.environ.get("EVENT_SUBSCRIBERS_MAX")
+        or (
+            int(os.environ.get("WORKER_CONNECTIONS", 1000)) // 2
+            if os.environ.get("SERVING_MODE") == "async"
+            else int(os.environ.get("THREADS", 32)) // 2
+        )
+    )
+    # seconds a client turned away by that limit is told to wait
+    EVENT_RETRY_AFTER = int(os.environ.get("EVENT_RETRY_AFTER", 10))
 
     # Add other configuration variables as needed
@@ -0,0 +1,33 @@
+"""
+Gunicorn Configuration
+======================
+Picked up automatically when gunicorn is started from this directory.
+
+Two serving modes, selected with the SERVING_MODE environment variable:
+
+- "threaded" (default): gthread workers.  Each in-flight request holds an
+  OS thread while it waits on Supabase or Telegram, so concurrency per
+  process is capped by THREADS.
+- "async": gevent workers.  Socket I/O is made cooperative, so the Supabase
+  (httpx) and Telegram (requests) calls yield to other requests while they
+  wait on the network, and the background threads and thread pools become
+  greenlets.  One process then holds up to WORKER_CONNECTIONS in-flight
+  requests, including idle SSE streams.
+
+Live order events are kept per process (see api/services/events.py), so
+WEB_CONCURRENCY defaults to a single worker.  Each open SSE stream or
+long-poll holds a thread in threaded mode; EVENT_SUBSCRIBERS_MAX (half of
+THREADS by default) caps them, and clients over the cap get a 503.
+"""
+
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+if os.environ.get("SERVING_MODE", "threaded") == "async":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 1000))
+else:
+    worker_class = "gthread"
+    threads = int(os.environ.get("THREADS", 32))
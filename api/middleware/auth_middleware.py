@@ -1,13 +1,46 @@
 from functools import wraps
 from flask import request, jsonify
 
+from api.services.auth_service import verify_token, redeem_stream_ticket
+
+
+def _bearer_token():
+    header = request.headers.get('Authorization', '')
+    if header.lower().startswith('bearer '):
+        return header[7:].strip()
+    return header.strip()
+
+
+def allow_stream_ticket(f):
+    """Let an SSE route accept `?ticket=` from POST /auth/stream-ticket.
+
+    EventSource cannot send headers.  Apply it below `require_auth` or
+    `require_admin`.
+    """
+    f.allows_stream_ticket = True
+    return f
+
+
+def _authenticate(allow_ticket=False):
+    """Verify the bearer token (or stream ticket) and attach the caller to the request."""
+    ticket = request.args.get('ticket')
+    if allow_ticket and ticket and 'Authorization' not in request.headers:
+        principal = redeem_stream_ticket(ticket)
+    else:
+        principal = verify_token(_bearer_token())
+    if principal is None:
+        return None
+    request.user_id = principal['user_id']
+    request.user_role = principal['role']
+    return principal
+
 
 def require_auth(f):
+    allow_ticket = getattr(f, 'allows_stream_ticket', False)
+
     @wraps(f)
     def decorated(*args, **kwargs):
-        # TODO: check for valid token/cookie
-        token = request.headers.get('Authorization')
-        if not token:
+        if _authenticate(allow_ticket) is None:
             return jsonify({'error': 'Authentication required'}), 401
         return f(*args, **kwargs)
 
@@ -15,12 +48,15 @@ def require_auth(f):
 
 
 def require_admin(f):
+    allow_ticket = getattr(f, 'allows_stream_ticket', False)
+
     @wraps(f)
     def decorated(*args, **kwargs):
-        # TODO: verify admin privileges
-        token = request.headers.get('Authorization')
-        if not token:
+        principal = _authenticate(allow_ticket)
+        if principal is None:
             return jsonify({'error': 'Admin authentication required'}), 401
+        if principal['role'] != 'admin':
+            return jsonify({'error': 'Admin privileges required'}), 403
         return f(*args, **kwargs)
 
     return decorated
@@ -0,0 +1,55 @@
+import hashlib
+from functools import wraps
+
+from flask import request, jsonify, make_response
+
+from api.services.idempotency import get_store, OWNER, REPLAY, MISMATCH
+
+MAX_KEY_LENGTH = 255
+
+
+def idempotent(f):
+    """Replay the stored response for a repeated `Idempotency-Key`.
+
+    Only successful (2xx) responses are stored; errors release the key so
+    the client can retry.  Keys are scoped to the authenticated user, so
+    place this decorator below `require_auth`.
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': 'Idempotency-Key is too long'}), 400
+
+        scoped_key = f"{getattr(request, 'user_id', None)}:{request.path}:{key}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        store = get_store()
+        outcome, record = store.begin(scoped_key, fingerprint)
+        if outcome == REPLAY:
+            response = make_response(jsonify(record['body']), record['status'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if outcome == MISMATCH:
+            return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+        if outcome != OWNER:
+            return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            store.release(scoped_key)
+            raise
+        if 200 <= response.status_code < 300 and response.is_json:
+            store.complete(
+                scoped_key,
+                fingerprint,
+                {'status': response.status_code, 'body': response.get_json()},
+            )
+        else:
+            store.release(scoped_key)
+        return response
+
+    return decorated
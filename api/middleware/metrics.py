@@ -0,0 +1,30 @@
+import time
+
+from flask import g, request
+
+from api.services.metrics import http_request_duration
+
+
+def init_app(app):
+    """Time every request into `http_request_duration_seconds`.
+
+    Requests are labelled by URL rule rather than path, so `/orders/17` and
+    `/orders/18` share one series; paths matching no rule are `unmatched`.
+    """
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_duration(response):
+        started = g.get('request_started')
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                request.method,
+                endpoint,
+                str(response.status_code),
+            )
+        return response
@@ -0,0 +1,75 @@
+import logging
+import random
+from urllib.parse import urlencode
+
+from flask import g, request
+
+from api.config import Config
+from api.services.auth_service import verify_token
+from api.services.profiler import Profile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+# query parameters never written to disk (SSE clients pass their ticket here)
+SECRET_PARAMS = ('ticket',)
+
+
+def _requested_by_admin():
+    if request.headers.get(PROFILE_HEADER) != '1':
+        return False
+    auth = request.headers.get('Authorization', '')
+    token = auth.split(' ', 1)[1] if auth.startswith('Bearer ') else None
+    user = verify_token(token)
+    return bool(user) and user['role'] == 'admin'
+
+
+def _logged_path():
+    """The request path and query string, without secret parameters."""
+    args = [(k, v) for k, v in request.args.items(multi=True) if k not in SECRET_PARAMS]
+    return request.path + ('?' + urlencode(args) if args else '')
+
+
+def init_app(app):
+    """Profile requests that ask for it (admins only) or are sampled.
+
+    An admin sends `X-Profile: 1`; besides that, `PROFILE_SAMPLE_RATE` of
+    all requests are profiled.  The response of a profiled request carries
+    the stored profile's id in `X-Profile-Id`.
+    """
+
+    @app.before_request
+    def start_profile():
+        if _requested_by_admin():
+            trigger = 'header'
+        elif Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE:
+            trigger = 'sample'
+        else:
+            return
+        g.profile = Profile(trigger)
+        g.profile.begin()
+
+    @app.after_request
+    def save_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        profile.finish()
+        info = {
+            'method': request.method,
+            'path': _logged_path(),
+            'endpoint': request.url_rule.rule if request.url_rule is not None else None,
+            'status': response.status_code,
+        }
+        try:
+            response.headers['X-Profile-Id'] = profile.save(info)
+        except OSError:
+            logger.exception('Could not store request profile')
+        return response
+
+    @app.teardown_request
+    def stop_profile(exc):
+        # the request failed before after_request; drop the profile
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.finish()
@@ -0,0 +1,47 @@
+import logging
+
+from flask import g, request
+
+from api.config import Config
+from api.services.query_log import start_log, end_log, endpoint_stats
+
+logger = logging.getLogger(__name__)
+
+
+def init_app(app):
+    """Count the Supabase queries of every request.
+
+    Adds `X-DB-Queries` and `Server-Timing: db;dur=<ms>` to the response
+    (unless `DB_TIMING_HEADERS` is off), feeds the per-endpoint totals of
+    `GET /admin/db/queries`, and logs requests that repeat one query shape
+    `N_PLUS_ONE_THRESHOLD` times or more.  Queries made while a streaming
+    response is sent, after the handler returns, are not counted.
+    """
+
+    @app.before_request
+    def open_query_log():
+        g.query_log, g.query_log_token = start_log()
+
+    @app.after_request
+    def report_queries(response):
+        log = g.get('query_log')
+        if log is None:
+            return response
+        if Config.DB_TIMING_HEADERS:
+            response.headers['X-DB-Queries'] = str(log.count)
+            response.headers.add(
+                'Server-Timing', f'db;dur={log.seconds * 1000:.1f};desc="queries: {log.count}"'
+            )
+        if request.url_rule is not None:
+            endpoint = f'{request.method} {request.url_rule.rule}'
+            repeated = log.repeated()
+            if repeated:
+                logger.warning('Possible N+1 in %s: %s', endpoint, repeated)
+            endpoint_stats.add(endpoint, log, repeated)
+        return response
+
+    @app.teardown_request
+    def close_query_log(exc):
+        token = g.pop('query_log_token', None)
+        if token is not None:
+            end_log(token)
@@ -1,7 +1,36 @@
-from flask import Blueprint, request, jsonify
-from api.middleware.auth_middleware import require_admin
+from datetime import date
+
+from flask import Blueprint, request, jsonify, send_file
+from api.config import Config
+from api.middleware.auth_middleware import require_admin, allow_stream_ticket
 from api.services.supabase_service import supabase_service
-from api.services.telegram import send_order_notification_to_student
+from api.services.enrichment import enrich_orders
+from api.services.order_state import (
+    TRANSITIONS,
+    TransitionConflict,
+    transition,
+    transition_many,
+    announce,
+)
+from api.services.menu_cache import menu_cache, invalidate_menu
+from api.services.auth_service import token_cache
+from api.services.inventory import stock_index
+from api.services.menu_search import menu_search
+from api.services.menu_bulk import (
+    UPDATE_FIELDS,
+    parse_rows,
+    validate_new_item,
+    validate_update,
+    bulk_create,
+    bulk_update,
+    bulk_delete,
+)
+from api.services.stats_service import get_dashboard_stats
+from api.services.events import sse_response
+from api.services.pagination import parse_limit, fetch_page, iter_pages, ndjson_response
+from api.services.telegram import admin_recipients
+from api.services.query_log import endpoint_stats
+from api.services.profiler import list_profiles, load_profile, profile_path
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -19,39 +48,29 @@ def get_pending_orders():
         client.table('orders')
         .select('*')
         .eq('status', 'pending')
-        .order('created_at', asc=True)
+        .order('created_at')
         .execute()
     )
-    orders = res.data or []
-    for order in orders:
-        uid = order.get('user_id')
-        usr = (
-            client.table('users')
-            .select('name,phone,telegram_id')
-            .eq('id', uid)
-            .single()
-            .execute()
-        )
-        order['user'] = usr.data
-
-        stall = (
-            client.table('food_stalls')
-            .select('name')
-            .eq('id', order.get('stall_id'))
-            .single()
-            .execute()
-        )
-        order['stall'] = stall.data
+    orders = enrich_orders(client, res.data or [])
+    return jsonify(orders)
 
-        items = (
-            client.table('order_items')
-            .select('*,menu_items(name,price)')
-            .eq('order_id', order.get('id'))
-            .execute()
-        )
-        order['items'] = items.data or []
 
-    return jsonify(orders)
+@bp.route('/orders/stream', methods=['GET'])
+@require_admin
+@allow_stream_ticket
+def stream_orders():
+    """Live order queue: order.created / order.status events over SSE."""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    return sse_response(['admin'], last_event_id)
+
+
+def _all_orders_query(client, status=None, order_date=None):
+    query = client.table('orders').select('*')
+    if status:
+        query = query.eq('status', status)
+    if order_date:
+        query = query.eq('created_at', order_date)  # simplistic; may need range
+    return query
 
 
 @bp.route('/orders', methods=['GET'])
@@ -59,186 +78,129 @@ def get_pending_orders():
 def get_all_orders():
     client = supabase_service.get_client()
     status = request.args.get('status')
-    date = request.args.get('date')
+    order_date = request.args.get('date')
 
-    query = client.table('orders').select('*')
-    if status:
-        query = query.eq('status', status)
-    if date:
-        query = query.eq('created_at', date)  # simplistic; may need range
-    query = query.order('created_at', desc=True)
-    res = query.execute()
-    orders = res.data or []
-
-    for order in orders:
-        uid = order.get('user_id')
-        usr = (
-            client.table('users')
-            .select('name,phone,telegram_id')
-            .eq('id', uid)
-            .single()
-            .execute()
+    if request.args.get('format') == 'ndjson':
+        pages = iter_pages(
+            lambda: _all_orders_query(client, status, order_date),
+            Config.ORDERS_EXPORT_PAGE_SIZE,
         )
-        order['user'] = usr.data
-
-        stall = (
-            client.table('food_stalls')
-            .select('name')
-            .eq('id', order.get('stall_id'))
-            .single()
-            .execute()
+        return ndjson_response(
+            order for page in pages for order in enrich_orders(client, page)
         )
-        order['stall'] = stall.data
 
-        items = (
-            client.table('order_items')
-            .select('*,menu_items(name,price)')
-            .eq('order_id', order.get('id'))
-            .execute()
+    try:
+        limit = parse_limit(
+            request.args.get('limit'), Config.ORDERS_PAGE_SIZE, Config.ORDERS_MAX_PAGE_SIZE
         )
-        order['items'] = items.data or []
+        orders, next_cursor = fetch_page(
+            _all_orders_query(client, status, order_date), request.args.get('cursor'), limit
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    orders = enrich_orders(client, orders)
+    return jsonify({'orders': orders, 'next_cursor': next_cursor})
 
-    return jsonify(orders)
+
+def _transition(order_id, action, changes=None):
+    client = supabase_service.get_client()
+    try:
+        order = transition(client, order_id, action, changes)
+    except TransitionConflict as e:
+        if e.status is None:
+            return None, (jsonify({'error': str(e)}), 404)
+        return None, (jsonify({'error': str(e), 'status': e.status}), 409)
+    announce(client, action, [order])
+    return order, None
 
 
 @bp.route('/orders/<int:order_id>/approve', methods=['POST'])
 @require_admin
 def approve_order(order_id):
-    client = supabase_service.get_client()
     body = request.get_json(silent=True) or {}
-    est = body.get('estimated_time')
-
-    order_res = (
-        client.table('orders')
-        .select('*')
-        .eq('id', order_id)
-        .single()
-        .execute()
+    order, error = _transition(
+        order_id, 'approve', {'estimated_time': body.get('estimated_time')}
     )
-    order = order_res.data
-    if not order or order.get('status') != 'pending':
-        return jsonify({'error': 'Order is not in pending state'}), 400
-
-    update = {'status': 'approved'}
-    if est is not None:
-        update['estimated_time'] = est
-    client.table('orders').update(update).eq('id', order_id).execute()
-
-    # notify user
-    user_res = (
-        client.table('users')
-        .select('telegram_id')
-        .eq('id', order.get('user_id'))
-        .single()
-        .execute()
-    )
-    tid = user_res.data and user_res.data.get('telegram_id')
-    msg = f"Your order #{order_id} has been approved!"
-    if est is not None:
-        msg += f" It will be ready in {est} minutes."
-    send_order_notification_to_student(tid, msg)
-
-    order['status'] = 'approved'
-    if est is not None:
-        order['estimated_time'] = est
+    if error:
+        return error
     return jsonify({'order': order, 'message': 'Order approved'})
 
 
 @bp.route('/orders/<int:order_id>/reject', methods=['POST'])
 @require_admin
 def reject_order(order_id):
-    client = supabase_service.get_client()
     body = request.get_json(silent=True) or {}
-    reason = body.get('reason', '')
-
-    order_res = (
-        client.table('orders')
-        .select('*')
-        .eq('id', order_id)
-        .single()
-        .execute()
-    )
-    order = order_res.data
-    if not order or order.get('status') != 'pending':
-        return jsonify({'error': 'Order is not in pending state'}), 400
-
-    update = {'status': 'rejected', 'rejection_reason': reason}
-    client.table('orders').update(update).eq('id', order_id).execute()
-
-    user_res = (
-        client.table('users')
-        .select('telegram_id')
-        .eq('id', order.get('user_id'))
-        .single()
-        .execute()
-    )
-    tid = user_res.data and user_res.data.get('telegram_id')
-    msg = f"Your order #{order_id} was rejected. Reason: {reason}."
-    send_order_notification_to_student(tid, msg)
-
-    order.update(update)
+    order, error = _transition(order_id, 'reject', {'rejection_reason': body.get('reason', '')})
+    if error:
+        return error
     return jsonify({'order': order, 'message': 'Order rejected'})
 
 
 @bp.route('/orders/<int:order_id>/ready', methods=['POST'])
 @require_admin
 def mark_ready(order_id):
-    client = supabase_service.get_client()
-    order_res = (
-        client.table('orders')
-        .select('*')
-        .eq('id', order_id)
-        .single()
-        .execute()
-    )
-    order = order_res.data
-    if not order or order.get('status') != 'approved':
-        return jsonify({'error': 'Order is not in approved state'}), 400
-
-    client.table('orders').update({'status': 'ready'}).eq('id', order_id).execute()
-
-    # get user telegram and stall name
-    user_res = (
-        client.table('users')
-        .select('telegram_id')
-        .eq('id', order.get('user_id'))
-        .single()
-        .execute()
-    )
-    tid = user_res.data and user_res.data.get('telegram_id')
-    stall_res = (
-        client.table('food_stalls')
-        .select('name')
-        .eq('id', order.get('stall_id'))
-        .single()
-        .execute()
-    )
-    stall_name = stall_res.data and stall_res.data.get('name')
-    msg = f"Your order #{order_id} is ready for pickup at {stall_name}!"
-    send_order_notification_to_student(tid, msg)
-
-    order['status'] = 'ready'
+    order, error = _transition(order_id, 'ready')
+    if error:
+        return error
     return jsonify({'order': order, 'message': 'Order marked as ready'})
 
 
 @bp.route('/orders/<int:order_id>/complete', methods=['POST'])
 @require_admin
 def complete_order(order_id):
+    order, error = _transition(order_id, 'complete')
+    if error:
+        return error
+    return jsonify({'order': order, 'message': 'Order completed'})
+
+
+@bp.route('/orders/bulk', methods=['POST'])
+@require_admin
+def bulk_transition_orders():
+    """Apply one action to many orders with a fixed number of queries.
+
+    The move is one conditional update (`status = expected`); orders that
+    did not move are looked up once to report their current status, and
+    telegram ids (plus stall names for `ready`) are fetched in one lookup
+    each.
+    """
     client = supabase_service.get_client()
-    order_res = (
-        client.table('orders')
-        .select('*')
-        .eq('id', order_id)
-        .single()
-        .execute()
-    )
-    order = order_res.data
-    if not order or order.get('status') != 'ready':
-        return jsonify({'error': 'Order is not in ready state'}), 400
+    body = request.get_json(silent=True) or {}
+    action = body.get('action')
+    if action not in TRANSITIONS:
+        return jsonify({'error': f"action must be one of {', '.join(TRANSITIONS)}"}), 400
+    order_ids = body.get('order_ids')
+    if (
+        not isinstance(order_ids, list)
+        or not order_ids
+        or not all(isinstance(i, int) and not isinstance(i, bool) for i in order_ids)
+    ):
+        return jsonify({'error': 'order_ids must be a non-empty list of integers'}), 400
+    order_ids = list(dict.fromkeys(order_ids))
+    if len(order_ids) > Config.ORDERS_BULK_MAX:
+        return jsonify({'error': f'At most {Config.ORDERS_BULK_MAX} orders per request'}), 400
+
+    changes = {
+        'estimated_time': body.get('estimated_time'),
+        'rejection_reason': body.get('reason', ''),
+    }
+    moved, conflicts = transition_many(client, order_ids, action, changes)
+    announce(client, action, list(moved.values()))
 
-    client.table('orders').update({'status': 'completed'}).eq('id', order_id).execute()
-    order['status'] = 'completed'
-    return jsonify({'order': order, 'message': 'Order completed'})
+    results = []
+    for order_id in order_ids:
+        if order_id in moved:
+            result = {'result': 'updated', 'status': moved[order_id]['status']}
+        elif conflicts[order_id] is None:
+            result = {'result': 'not_found'}
+        else:
+            result = {'result': 'conflict', 'status': conflicts[order_id]}
+        results.append({'order_id': order_id, **result})
+
+    summary = {}
+    for result in results:
+        summary[result['result']] = summary.get(result['result'], 0) + 1
+    return jsonify({'action': action, 'results': results, 'summary': summary})
 
 
 # ──────────────────────────────────────────────
@@ -251,12 +213,9 @@ def complete_order(order_id):
 def add_menu_item():
     client = supabase_service.get_client()
     body = request.get_json(silent=True) or {}
-    required = ['stall_id', 'name', 'price', 'category']
-    for field in required:
-        if field not in body:
-            return jsonify({'error': f'{field} is required'}), 400
-    if body['category'] not in ['main', 'snack', 'beverage', 'dessert']:
-        return jsonify({'error': 'Invalid category'}), 400
+    error = validate_new_item(body)
+    if error:
+        return jsonify({'error': error}), 400
 
     # verify stall exists
     stall = (
@@ -270,6 +229,7 @@ def add_menu_item():
         return jsonify({'error': 'Stall not found'}), 400
 
     insert_res = client.table('menu_items').insert(body).execute()
+    _menu_changed(insert_res.data)
     return jsonify({'item': insert_res.data[0]}), 201
 
 
@@ -289,11 +249,13 @@ def update_menu_item(item_id):
     if not existing.data:
         return jsonify({'error': 'Item not found'}), 404
 
-    update_data = {k: v for k, v in body.items() if k in ['name', 'price', 'is_available', 'image_url']}
-    if not update_data:
-        return jsonify({'error': 'No valid fields provided'}), 400
+    update_data = {k: v for k, v in body.items() if k in UPDATE_FIELDS}
+    error = validate_update(update_data)
+    if error:
+        return jsonify({'error': error}), 400
 
     res = client.table('menu_items').update(update_data).eq('id', item_id).execute()
+    _menu_changed(res.data)
     return jsonify({'item': res.data[0]})
 
 
@@ -303,7 +265,7 @@ def delete_menu_item(item_id):
     client = supabase_service.get_client()
     existing = (
         client.table('menu_items')
-        .select('id')
+        .select('id,stall_id')
         .eq('id', item_id)
         .single()
         .execute()
@@ -312,74 +274,148 @@ def delete_menu_item(item_id):
         return jsonify({'error': 'Item not found'}), 404
 
     client.table('menu_items').delete().eq('id', item_id).execute()
+    _menu_changed(deleted=[existing.data])
     return jsonify({'message': 'Item deleted'})
 
 
+def _menu_changed(rows=(), deleted=()):
+    """Apply menu_items writes to the menu cache, stock and search indexes.
+
+    `rows` are rows as returned by an insert or update, `deleted` need only
+    carry `id` and `stall_id`.
+    """
+    invalidate_menu(
+        stall_ids={r.get('stall_id') for r in [*rows, *deleted]},
+        item_ids=[r['id'] for r in [*rows, *deleted]],
+    )
+    for row in rows:
+        stock_index.sync_item(row)
+        menu_search.upsert_item(row)
+    for row in deleted:
+        stock_index.remove_item(row['id'])
+        menu_search.remove_item(row['id'])
+
+
+def _bulk_rows(key):
+    """Parse a bulk body, or return an error response."""
+    try:
+        rows = parse_rows(request, key)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    if not rows:
+        return None, (jsonify({'error': 'No rows provided'}), 400)
+    if len(rows) > Config.MENU_BULK_MAX_ROWS:
+        return None, (
+            jsonify({'error': f'At most {Config.MENU_BULK_MAX_ROWS} rows per request'}),
+            400,
+        )
+    return rows, None
+
+
+@bp.route('/menu/items/bulk', methods=['POST'])
+@require_admin
+def bulk_add_menu_items():
+    rows, error = _bulk_rows('items')
+    if error:
+        return error
+    report, created = bulk_create(supabase_service.get_client(), rows)
+    _menu_changed(created)
+    return jsonify(report)
+
+
+@bp.route('/menu/items/bulk', methods=['PATCH'])
+@require_admin
+def bulk_update_menu_items():
+    rows, error = _bulk_rows('items')
+    if error:
+        return error
+    report, updated = bulk_update(supabase_service.get_client(), rows)
+    _menu_changed(updated)
+    return jsonify(report)
+
+
+@bp.route('/menu/items/bulk', methods=['DELETE'])
+@require_admin
+def bulk_delete_menu_items():
+    rows, error = _bulk_rows('ids')
+    if error:
+        return error
+    # CSV uploads give one {"id": ...} row per line
+    ids = [r.get('id') if isinstance(r, dict) else r for r in rows]
+    report, deleted = bulk_delete(supabase_service.get_client(), ids)
+    _menu_changed(deleted=deleted)
+    return jsonify(report)
+
+
 # ──────────────────────────────────────────────
 # Stats / Analytics
 # ──────────────────────────────────────────────
 
 
-@bp.route('/stats', methods=['GET'])
+@bp.route('/cache/stats', methods=['GET'])
 @require_admin
-def get_stats():
-    client = supabase_service.get_client()
-    from datetime import date
-    today = date.today().isoformat()
+def get_cache_stats():
+    caches = [
+        menu_cache.stats(),
+        admin_recipients.stats(),
+        token_cache.stats(),
+        menu_search.stats(),
+    ]
+    return jsonify({'caches': caches, 'stock': stock_index.stats()})
 
-    # today's order count
-    today_res = (
-        client.table('orders')
-        .select('*', count='exact')
-        .gte('created_at', today)
-        .execute()
-    )
-    today_orders = today_res.count or 0
 
-    pending_res = (
-        client.table('orders')
-        .select('*', count='exact')
-        .eq('status', 'pending')
-        .execute()
-    )
-    pending_orders = pending_res.count or 0
+@bp.route('/db/pool', methods=['GET'])
+@require_admin
+def get_pool_stats():
+    return jsonify({'pools': supabase_service.pool_stats()})
 
-    # compute revenue by pulling rows and summing
-    rev_res = (
-        client.table('orders')
-        .select('total_amount')
-        .gte('created_at', today)
-        .in_('status', ['approved', 'ready', 'completed'])
-        .execute()
-    )
-    today_revenue = sum(o.get('total_amount', 0) for o in (rev_res.data or []))
 
-    # popular items top 5
-    items_res = (
-        client.table('order_items')
-        .select('menu_item_id,quantity')
-        .execute()
-    )
-    counts = {}
-    for oi in (items_res.data or []):
-        mid = oi.get('menu_item_id')
-        counts[mid] = counts.get(mid, 0) + oi.get('quantity', 0)
-    # fetch names for top 5
-    popular = []
-    for mid, cnt in sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:5]:
-        mi_res = (
-            client.table('menu_items')
-            .select('name')
-            .eq('id', mid)
-            .single()
-            .execute()
-        )
-        popular.append({'name': mi_res.data.get('name') if mi_res.data else None, 'count': cnt})
+@bp.route('/db/queries', methods=['GET'])
+@require_admin
+def get_query_stats():
+    """Queries per request by endpoint, with likely N+1 patterns."""
+    return jsonify({'endpoints': endpoint_stats.stats()})
 
-    stats = {
-        'today_orders': today_orders,
-        'pending_orders': pending_orders,
-        'today_revenue': today_revenue,
-        'popular_items': popular,
-    }
+
+@bp.route('/profiles', methods=['GET'])
+@require_admin
+def get_profiles():
+    """Stored request profiles of this host, newest first."""
+    return jsonify({'profiles': list_profiles()})
+
+
+@bp.route('/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def get_profile(profile_id):
+    """One profile as JSON, or its raw pstats file with ?format=pstats."""
+    if request.args.get('format') == 'pstats':
+        path = profile_path(profile_id, 'prof')
+        if path is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return send_file(path, as_attachment=True, download_name=f'{profile_id}.prof')
+    profile = load_profile(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify({'profile': profile})
+
+
+@bp.route('/stats', methods=['GET'])
+@require_admin
+def get_stats():
+    args = request.args
+    try:
+        start = args.get('from') and date.fromisoformat(args['from']).isoformat()
+        end = args.get('to') and date.fromisoformat(args['to']).isoformat()
+        stall_id = int(args['stall_id']) if args.get('stall_id') else None
+    except ValueError:
+        return jsonify({'error': 'from/to must be YYYY-MM-DD and stall_id an integer'}), 400
+    if start and end and start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+
+    stats = get_dashboard_stats(
+        start=start or None,
+        end=end or None,
+        stall_id=stall_id,
+        by_stall=args.get('breakdown') == 'stall',
+    )
     return jsonify(stats)
@@ -1,4 +1,7 @@
 from flask import Blueprint, request, jsonify
+from api.config import Config
+from api.middleware.auth_middleware import require_auth
+from api.services.auth_service import issue_stream_ticket
 from api.services.supabase_service import supabase_service
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -15,8 +18,7 @@ def register():
     if not email or not password:
         return jsonify({'error': 'email and password are required'}), 400
 
-    client = supabase_service.get_client()
-    auth = client.auth
+    auth = supabase_service.get_anon_client().auth
     res = auth.sign_up({"email": email, "password": password})
     if res.get('error'):
         return jsonify({'error': res['error']['message']}), 400
@@ -27,7 +29,7 @@ def register():
     # create profile row if user object present
     if user:
         try:
-            client.table('users').insert(
+            supabase_service.get_client().table('users').insert(
                 {
                     'id': user.get('id'),
                     'email': email,
@@ -51,8 +53,7 @@ def login():
     if not email or not password:
         return jsonify({'error': 'email and password are required'}), 400
 
-    client = supabase_service.get_client()
-    auth = client.auth
+    auth = supabase_service.get_anon_client().auth
     res = auth.sign_in_with_password({"email": email, "password": password})
     if res.get('error'):
         return jsonify({'error': res['error']['message']}), 401
@@ -63,9 +64,19 @@ def login():
 @bp.route('/logout', methods=['POST'])
 def logout():
     # token is typically sent in Authorization header but Supabase client uses stored
-    client = supabase_service.get_client()
+    client = supabase_service.get_anon_client()
     try:
         client.auth.sign_out()
     except Exception:
         pass
     return jsonify({'message': 'logged out'})
+
+
+@bp.route('/stream-ticket', methods=['POST'])
+@require_auth
+def stream_ticket():
+    """Single-use credential for opening one SSE stream with `?ticket=`."""
+    return jsonify({
+        'ticket': issue_stream_ticket(request.user_id),
+        'expires_in': Config.STREAM_TICKET_TTL,
+    })
@@ -1,11 +1,16 @@
-from flask import Blueprint, request, jsonify
+import hashlib
+
+from flask import Blueprint, Response, current_app, request, jsonify
+from api.config import Config
 from api.services.supabase_service import supabase_service
+from api.services.menu_cache import menu_cache, STALLS_KEY, stall_items_key, item_key
+from api.services.menu_search import menu_search
+from api.services.pagination import parse_limit
 
 bp = Blueprint('menu', __name__, url_prefix='/menu')
 
 
-@bp.route('/stalls', methods=['GET'])
-def list_stalls():
+def _load_stalls():
     client = supabase_service.get_client()
     res = (
         client.table('food_stalls')
@@ -13,13 +18,10 @@ def list_stalls():
         .eq('is_active', True)
         .execute()
     )
-    stalls = res.data or []
-    return jsonify({'stalls': stalls})
+    return res.data or []
 
 
-@bp.route('/stalls/<int:stall_id>/items', methods=['GET'])
-def list_items(stall_id):
-    category = request.args.get('category')
+def _load_items(stall_id, category):
     client = supabase_service.get_client()
     query = (
         client.table('menu_items')
@@ -30,12 +32,10 @@ def list_items(stall_id):
     if category:
         query = query.eq('category', category)
     res = query.execute()
-    items = res.data or []
-    return jsonify({'stall_id': stall_id, 'items': items})
+    return res.data or []
 
 
-@bp.route('/items/<int:item_id>', methods=['GET'])
-def get_item(item_id):
+def _load_item(item_id):
     client = supabase_service.get_client()
     res = (
         client.table('menu_items')
@@ -44,10 +44,80 @@ def get_item(item_id):
         .single()
         .execute()
     )
-    item = res.data
-    if not item:
+    return res.data
+
+
+def _cache_headers(response):
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.MENU_HTTP_MAX_AGE
+    return response
+
+
+def _build_entry(payload):
+    """Serialize a payload once and key it by a hash of its bytes."""
+    if payload is None:
+        return None
+    body = current_app.json.dumps(payload) + '\n'
+    etag = hashlib.sha1(body.encode()).hexdigest()
+    return body, etag
+
+
+def _cached_response(key, build):
+    """Serve a cached, pre-serialized menu payload with ETag support.
+
+    `build` returns the response payload or None when the resource does not
+    exist.  A matching `If-None-Match` is answered with 304 straight from
+    the cached ETag, without querying or serializing anything.  Matching is
+    weak, as RFC 9110 requires for If-None-Match, so a `W/` tag from a
+    compressing proxy still matches.  Returns None when `build` found
+    nothing.
+    """
+    entry = menu_cache.get_or_load(key, lambda: _build_entry(build()))
+    if entry is None:
+        return None
+    body, etag = entry
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return _cache_headers(response)
+
+
+@bp.after_request
+def add_etag(response):
+    """Give uncached GET responses (e.g. search) a content-hash ETag."""
+    if request.method == 'GET' and response.status_code == 200 and not response.get_etag()[0]:
+        response.add_etag()
+        _cache_headers(response)
+        response.make_conditional(request)
+    return response
+
+
+@bp.route('/stalls', methods=['GET'])
+def list_stalls():
+    return _cached_response(STALLS_KEY, lambda: {'stalls': _load_stalls()})
+
+
+@bp.route('/stalls/<int:stall_id>/items', methods=['GET'])
+def list_items(stall_id):
+    category = request.args.get('category')
+    return _cached_response(
+        stall_items_key(stall_id, category),
+        lambda: {'stall_id': stall_id, 'items': _load_items(stall_id, category)},
+    )
+
+
+@bp.route('/items/<int:item_id>', methods=['GET'])
+def get_item(item_id):
+    def build():
+        item = _load_item(item_id)
+        return {'item': item} if item else None
+
+    response = _cached_response(item_key(item_id), build)
+    if response is None:
         return jsonify({'error': 'Item not found'}), 404
-    return jsonify({'item': item})
+    return response
 
 
 @bp.route('/search', methods=['GET'])
@@ -55,23 +125,10 @@ def search_menu():
     q = request.args.get('q', '').strip()
     if not q:
         return jsonify({'error': 'query parameter q is required'}), 400
+    try:
+        limit = parse_limit(request.args.get('limit'), 20, Config.SEARCH_MAX_RESULTS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    client = supabase_service.get_client()
-    # using ilike equivalent via .ilike (if supported) or filter
-    res = (
-        client.table('menu_items')
-        .select('*,food_stalls(name)')
-        .ilike('name', f'%{q}%')
-        .eq('is_available', True)
-        .execute()
-    )
-    items = res.data or []
-    # attach stall_name manually if not already
-    results = []
-    for mi in items:
-        entry = mi.copy()
-        fs = mi.get('food_stalls')
-        if fs and isinstance(fs, list) and fs:
-            entry['stall_name'] = fs[0].get('name')
-        results.append(entry)
-    return jsonify({'query': q, 'results': results})
+    # answered from the in-memory index, without a database call
+    return jsonify({'query': q, 'results': menu_search.search(q, limit=limit)})
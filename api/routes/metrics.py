@@ -0,0 +1,75 @@
+import hmac
+
+from flask import Blueprint, Response, request, jsonify
+from api.config import Config
+from api.services import metrics
+from api.services.auth_service import token_cache
+from api.services.menu_cache import menu_cache
+from api.services.supabase_service import supabase_service
+from api.services.telegram import admin_recipients
+from api.services.telegram_dispatcher import dispatcher
+
+bp = Blueprint('metrics', __name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _cache_metrics():
+    caches = [menu_cache.stats(), admin_recipients.stats(), token_cache.stats()]
+
+    def per_cache(field):
+        return [({'cache': c['name']}, c[field]) for c in caches]
+
+    return [
+        ('cache_hits_total', 'counter', 'Lookups answered from the cache', per_cache('hits')),
+        ('cache_misses_total', 'counter', 'Lookups that had to load', per_cache('misses')),
+        ('cache_evictions_total', 'counter', 'Entries evicted to make room', per_cache('evictions')),
+        ('cache_hit_ratio', 'gauge', 'Hits over lookups since start', per_cache('hit_ratio')),
+        ('cache_entries', 'gauge', 'Entries currently cached', per_cache('size')),
+    ]
+
+
+def _telegram_metrics():
+    stats = dispatcher.stats()
+    outcomes = ('sent', 'failed', 'dropped', 'retried')
+    return [
+        ('telegram_queue_depth', 'gauge', 'Messages waiting for a worker',
+         [({}, stats['queue_depth'])]),
+        ('telegram_retry_depth', 'gauge', 'Messages waiting to be retried',
+         [({}, stats['retry_depth'])]),
+        ('telegram_messages_total', 'counter', 'Messages by final outcome',
+         [({'outcome': o}, stats[o]) for o in outcomes]),
+    ]
+
+
+def _pool_metrics():
+    pools = {
+        name: stats for name, stats in supabase_service.pool_stats().items()
+        if 'in_flight' in stats
+    }
+    return [
+        ('supabase_pool_in_flight', 'gauge', 'Supabase HTTP requests in flight',
+         [({'client': name}, s['in_flight']) for name, s in pools.items()]),
+        ('supabase_pool_connections', 'gauge', 'Open Supabase HTTP connections',
+         [({'client': name}, s['connections']) for name, s in pools.items()]),
+    ]
+
+
+metrics.register_collector(_cache_metrics)
+metrics.register_collector(_telegram_metrics)
+metrics.register_collector(_pool_metrics)
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint; needs `Bearer METRICS_TOKEN`.
+
+    Off (404) when no token is configured, unless METRICS_PUBLIC is set.
+    """
+    if Config.METRICS_TOKEN:
+        auth = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth, f'Bearer {Config.METRICS_TOKEN}'):
+            return jsonify({'error': 'Unauthorized'}), 401
+    elif not Config.METRICS_PUBLIC:
+        return jsonify({'error': 'Not found'}), 404
+    return Response(metrics.render(), mimetype=CONTENT_TYPE)
@@ -1,12 +1,22 @@
 from flask import Blueprint, request, jsonify
-from api.middleware.auth_middleware import require_auth
-from api.services.order_service import create_new_order, get_user_orders, get_order_detail
+from api.middleware.auth_middleware import require_auth, allow_stream_ticket
+from api.middleware.idempotency import idempotent
+from api.config import Config
+from api.services.order_service import (
+    create_new_order,
+    get_user_orders,
+    iter_user_orders,
+    get_order_detail,
+)
+from api.services.pagination import parse_limit, ndjson_response
+from api.services.events import sse_response, poll_events, user_topic
 
 bp = Blueprint('orders', __name__, url_prefix='/orders')
 
 
 @bp.route('', methods=['POST'])
 @require_auth
+@idempotent
 def place_order():
     user_id = request.user_id  # assume middleware attaches this
     body = request.get_json(silent=True) or {}
@@ -26,8 +36,37 @@ def place_order():
 def list_orders():
     user_id = request.user_id
     status = request.args.get('status')
-    orders = get_user_orders(user_id, status)
-    return jsonify({'orders': orders})
+    if request.args.get('format') == 'ndjson':
+        return ndjson_response(iter_user_orders(user_id, status))
+    try:
+        limit = parse_limit(
+            request.args.get('limit'), Config.ORDERS_PAGE_SIZE, Config.ORDERS_MAX_PAGE_SIZE
+        )
+        page = get_user_orders(user_id, status, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
+
+
+@bp.route('/stream', methods=['GET'])
+@require_auth
+@allow_stream_ticket
+def stream_my_orders():
+    """Status changes of the caller's orders as Server-Sent Events."""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    return sse_response([user_topic(request.user_id)], last_event_id)
+
+
+@bp.route('/events', methods=['GET'])
+@require_auth
+def poll_my_orders():
+    """Long-poll variant of /orders/stream: pass back `last_event_id` as `since`."""
+    try:
+        timeout = float(request.args.get('timeout', Config.LONG_POLL_TIMEOUT))
+    except ValueError:
+        return jsonify({'error': 'timeout must be a number'}), 400
+    timeout = max(0.0, min(timeout, Config.LONG_POLL_TIMEOUT))
+    return jsonify(poll_events([user_topic(request.user_id)], request.args.get('since'), timeout))
 
 
 @bp.route('/<int:order_id>', methods=['GET'])
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from api.middleware.auth_middleware import require_auth
 from api.services.supabase_service import supabase_service
+from api.services.telegram import invalidate_admin_recipients
 
 bp = Blueprint('users', __name__, url_prefix='/users')
 
@@ -33,7 +34,8 @@ def profile():
         client.table('users')
         .update(update_data)
         .eq('id', user_id)
-        .single()
         .execute()
     )
-    return jsonify({'user': res.data})
+    if 'telegram_id' in update_data:
+        invalidate_admin_recipients()
+    return jsonify({'user': res.data[0] if res.data else None})
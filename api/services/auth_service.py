@@ -0,0 +1,209 @@
+"""
+Auth Service
+============
+Verifies bearer tokens and resolves the caller's user id and role.
+
+Verification is cached so it is off the network path for almost every
+request:
+
+- With `SUPABASE_JWT_SECRET` set, HS256 tokens are checked locally (HMAC and
+  expiry), with no call to Supabase at all.  Otherwise the token is sent to
+  Supabase Auth once and the answer is reused.
+- Verified user ids are kept in a TTL cache keyed by a SHA-256 of the
+  token, never the token itself, and never beyond the token's own `exp`.
+- Roles come from a pre-fetched set of admin user ids that is refreshed every
+  `ADMIN_ROLES_TTL` seconds; everyone else is a student.
+
+Browsers' `EventSource` cannot send an Authorization header, and a bearer
+token in the URL would end up in server, proxy and browser logs.  SSE
+clients instead trade their token for a stream ticket: signed with
+`SECRET_KEY`, valid for `STREAM_TICKET_TTL` seconds and accepted once.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import threading
+import time
+
+from api.config import Config
+from api.services.cache import TTLCache
+from api.services.supabase_service import supabase_service
+
+logger = logging.getLogger(__name__)
+
+token_cache = TTLCache(
+    maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.AUTH_CACHE_TTL, name="auth_tokens"
+)
+
+_admin_ids = None
+_admin_ids_loaded_at = 0.0
+_admin_lock = threading.Lock()
+
+# nonces of redeemed stream tickets, kept until the tickets expire
+used_tickets = TTLCache(maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.STREAM_TICKET_TTL,
+                        name="stream_tickets")
+_ticket_lock = threading.Lock()
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def decode_claims(token):
+    """Return the JWT payload without checking the signature, or None."""
+    try:
+        return json.loads(_b64decode(token.split(".")[1]))
+    except Exception:
+        return None
+
+
+def _verify_locally(token, secret):
+    """Check an HS256 token's signature and expiry; return its claims."""
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        signature = _b64decode(signature_b64)
+    except Exception:
+        return None
+    if header.get("alg") != "HS256":
+        return None
+    expected = hmac.new(
+        secret.encode(), f"{header_b64}.{payload_b64}".encode(), hashlib.sha256
+    ).digest()
+    if not hmac.compare_digest(expected, signature):
+        return None
+    claims = decode_claims(token)
+    if not claims or not claims.get("sub"):
+        return None
+    if claims.get("exp") is not None and claims["exp"] <= time.time():
+        return None
+    return claims
+
+
+def _verify_remotely(token):
+    """Ask Supabase Auth who the token belongs to; return its user id."""
+    try:
+        res = supabase_service.get_user_from_token(token)
+    except Exception as exc:
+        logger.info("Token rejected by Supabase: %s", exc)
+        return None
+    user = getattr(res, "user", None)
+    if user is None and isinstance(res, dict):
+        user = res.get("user")
+    if user is None:
+        return None
+    return user.get("id") if isinstance(user, dict) else getattr(user, "id", None)
+
+
+def _admin_user_ids():
+    """Admin user ids, re-fetched at most every ADMIN_ROLES_TTL seconds."""
+    global _admin_ids, _admin_ids_loaded_at
+    if _admin_ids is not None and time.monotonic() - _admin_ids_loaded_at < Config.ADMIN_ROLES_TTL:
+        return _admin_ids
+    with _admin_lock:
+        if _admin_ids is None or time.monotonic() - _admin_ids_loaded_at >= Config.ADMIN_ROLES_TTL:
+            prefetch_admin_roles()
+    return _admin_ids
+
+
+def prefetch_admin_roles():
+    """Load the ids of all admins so role checks need no query."""
+    global _admin_ids, _admin_ids_loaded_at
+    client = supabase_service.get_client()
+    res = client.table("users").select("id").eq("role", "admin").execute()
+    _admin_ids = frozenset(str(row["id"]) for row in (res.data or []))
+    _admin_ids_loaded_at = time.monotonic()
+    return _admin_ids
+
+
+def invalidate_admin_roles():
+    """Force the next role check to re-fetch the admin list."""
+    global _admin_ids
+    _admin_ids = None
+
+
+def role_for(user_id):
+    return "admin" if str(user_id) in _admin_user_ids() else "student"
+
+
+def verify_token(token):
+    """Return `{"user_id", "role"}` for a valid token, or None.
+
+    The verified user id is cached per token until the token expires or
+    `AUTH_CACHE_TTL` passes, whichever comes first; the role is looked up in
+    the admin set on every call so role changes apply without waiting for
+    tokens to expire.
+    """
+    if not token:
+        return None
+    key = hashlib.sha256(token.encode()).hexdigest()
+    user_id = token_cache.get(key)
+    if user_id is None:
+        user_id = _verify(token, key)
+        if user_id is None:
+            return None
+    return {"user_id": user_id, "role": role_for(user_id)}
+
+
+def _verify(token, key):
+    if Config.SUPABASE_JWT_SECRET:
+        claims = _verify_locally(token, Config.SUPABASE_JWT_SECRET)
+        user_id = claims and claims.get("sub")
+    else:
+        claims = decode_claims(token)
+        user_id = _verify_remotely(token)
+    if not user_id:
+        return None
+
+    ttl = Config.AUTH_CACHE_TTL
+    if claims and claims.get("exp") is not None:
+        ttl = min(ttl, claims["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(key, user_id, ttl=ttl)
+    return user_id
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _ticket_signature(payload_b64):
+    return hmac.new(Config.SECRET_KEY.encode(), payload_b64.encode(), hashlib.sha256).digest()
+
+
+def issue_stream_ticket(user_id):
+    """A single-use ticket that authenticates `user_id` for one SSE stream."""
+    claims = {
+        "sub": str(user_id),
+        "exp": time.time() + Config.STREAM_TICKET_TTL,
+        "nonce": secrets.token_urlsafe(12),
+    }
+    payload_b64 = _b64encode(json.dumps(claims).encode())
+    return f"{payload_b64}.{_b64encode(_ticket_signature(payload_b64))}"
+
+
+def redeem_stream_ticket(ticket):
+    """Return `{"user_id", "role"}` for a valid, unused ticket, or None.
+
+    Tickets are spent on first use.  The record of spent tickets is per
+    process, like the event streams themselves.
+    """
+    try:
+        payload_b64, signature_b64 = ticket.split(".")
+        signature = _b64decode(signature_b64)
+        claims = json.loads(_b64decode(payload_b64))
+    except Exception:
+        return None
+    if not hmac.compare_digest(_ticket_signature(payload_b64), signature):
+        return None
+    if claims.get("exp", 0) <= time.time() or not claims.get("sub"):
+        return None
+    with _ticket_lock:
+        if used_tickets.get(claims["nonce"]) is not None:
+            return None
+        used_tickets.set(claims["nonce"], True)
+    return {"user_id": claims["sub"], "role": role_for(claims["sub"])}
@@ -0,0 +1,115 @@
+"""
+In-Process Cache
+================
+A small thread-safe cache with a size bound, per-entry TTL and LRU eviction.
+
+Each gunicorn worker holds its own instance, so entries are only shared
+between threads of one process.  Keep TTLs short enough that a change made
+through another worker becomes visible in acceptable time.
+
+`get_or_load` runs the loader outside the lock.  Every invalidation bumps a
+generation counter, and a loaded value is only stored if no invalidation
+happened while it loaded, since it may predate the write that caused it.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire `ttl` seconds after insert."""
+
+    def __init__(self, maxsize=1024, ttl=60.0, name="cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by every delete / delete_prefix / clear
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the live value for `key`, or `default` (counted as a miss)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store `value`; `ttl` overrides the cache default for this entry."""
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value or call `loader()` and cache its result.
+
+        `None` results are returned but not cached, so missing rows are
+        looked up again on the next request.  Neither is a result loaded
+        while the cache was invalidated; it is returned to this caller only.
+        """
+        with self._lock:
+            generation = self._generation
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if value is not None:
+            with self._lock:
+                if self._generation == generation:
+                    self._store(key, value, ttl)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        """Drop every entry whose (string) key starts with `prefix`."""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._data if str(k).startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Counters for monitoring; the hit ratio is 0 before any lookup."""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,102 @@
+"""
+Concurrent Queries
+==================
+Run independent Supabase lookups at the same time on a shared thread pool.
+
+A handler that needs, say, an order's items and its stall can issue both
+queries at once, so its latency is that of the slowest query rather than
+the sum of them.  The pool is shared by all requests in the process, which
+caps how many queries a worker has in flight; under the gevent serving mode
+its threads are greenlets.
+
+Each call runs in a copy of the caller's context, so per-request state held
+in context variables (such as the query log) follows it onto the pool.
+
+A call's timeout counts from when it starts running, not from when it was
+submitted.  Under load the shared pool is busy and calls may queue behind
+other requests' queries, and that wait is not the query's fault.  Queueing
+is still bounded: a call that has not started `QUEUED_TIMEOUT_FACTOR` times
+the timeout after submission raises ConcurrencyTimeout, so a request never
+hangs on a saturated pool.
+"""
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from api.config import Config
+
+_pool = ThreadPoolExecutor(max_workers=Config.QUERY_POOL_SIZE, thread_name_prefix="query")
+# how often to look again while calls are still queued for a pool thread
+_QUEUED_POLL = 0.05
+# a call may wait this many timeouts for a pool thread before giving up
+QUEUED_TIMEOUT_FACTOR = 2
+
+
+class QueryTimeout(TimeoutError):
+    """Raised when concurrent lookups do not finish within their timeout."""
+
+
+class ConcurrencyTimeout(QueryTimeout):
+    """Raised when lookups are still waiting for a pool thread at their deadline."""
+
+
+def _run(started, name, context, call):
+    started[name] = time.monotonic()
+    return context.run(call)
+
+
+def run_concurrently(calls, timeout=None):
+    """Run zero-argument callables concurrently and return their results.
+
+    `calls` maps a name to a callable; the result maps the same names to
+    return values.  If any call raises, or runs for more than `timeout`
+    seconds (default `QUERY_TIMEOUT`), calls that have not started yet are
+    cancelled and the error (or QueryTimeout) is raised.  Calls still queued
+    `QUEUED_TIMEOUT_FACTOR * timeout` seconds after submission are cancelled
+    the same way and raise ConcurrencyTimeout.  Calls already running
+    finish in the background, bounded by the HTTP client timeout.
+    A single call is simply run inline.
+    """
+    if timeout is None:
+        timeout = Config.QUERY_TIMEOUT
+    if len(calls) == 1:
+        name, call = next(iter(calls.items()))
+        return {name: call()}
+
+    started = {}  # name -> monotonic time the call began running
+    queue_deadline = time.monotonic() + QUEUED_TIMEOUT_FACTOR * timeout
+    futures = {
+        name: _pool.submit(_run, started, name, contextvars.copy_context(), call)
+        for name, call in calls.items()
+    }
+    pending = set(futures.values())
+    while pending:
+        now = time.monotonic()
+        waiting = {name: f for name, f in futures.items() if f in pending}
+        deadlines = [started[name] + timeout for name in waiting if name in started]
+        overdue = [name for name in waiting if name in started and started[name] + timeout <= now]
+        queued = [name for name in waiting if name not in started]
+        if overdue:
+            for future in pending:
+                future.cancel()
+            raise QueryTimeout(
+                f"{', '.join(sorted(overdue))} did not finish within {timeout}s of starting"
+            )
+        if queued and now >= queue_deadline:
+            for future in pending:
+                future.cancel()
+            raise ConcurrencyTimeout(
+                f"{', '.join(sorted(queued))} still waiting for a pool thread after "
+                f"{QUEUED_TIMEOUT_FACTOR * timeout}s"
+            )
+        wake = min(deadlines, default=now + timeout) - now
+        if queued:
+            wake = min(wake, _QUEUED_POLL, queue_deadline - now)
+        done, pending = wait(pending, timeout=wake, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                for other in pending:
+                    other.cancel()
+                raise future.exception()
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,115 @@
+"""
+Order Enrichment
+================
+Batched lookups that attach users, stalls and items to a page of orders.
+
+Listing endpoints used to run one `users`, one `food_stalls` and one
+`order_items` query per order.  The helpers here fetch each related table
+once for the whole page with an `in_()` filter and join the rows in memory,
+so a page costs a fixed number of queries regardless of its size.
+
+PostgREST returns at most `SUPABASE_MAX_ROWS` rows per query and silently
+drops the rest.  A page has one user and one stall per order, but may have
+many items per order, so the item lookup reads further `.range()` pages
+until one comes back short.
+"""
+
+from api.config import Config
+from api.services.concurrency import run_concurrently
+
+
+def _unique(values):
+    """Return the non-empty values in first-seen order without duplicates."""
+    return [v for v in dict.fromkeys(values) if v is not None]
+
+
+def _strip_key(row, fields, key):
+    """Drop the join key from a row unless the caller asked for it."""
+    if fields == "*" or key in [f.strip() for f in fields.split(",")]:
+        return row
+    return {k: v for k, v in row.items() if k != key}
+
+
+def fetch_by_ids(client, table, fields, ids):
+    """Fetch rows of `table` whose `id` is in `ids`, keyed by id.
+
+    `fields` is the PostgREST column list the caller wants back; the id
+    column is always selected for the join and removed again afterwards
+    if it was not requested.
+    """
+    ids = _unique(ids)
+    if not ids:
+        return {}
+    columns = fields if fields == "*" else f"id,{fields}"
+    res = client.table(table).select(columns).in_("id", ids).execute()
+    return {row["id"]: _strip_key(row, fields, "id") for row in (res.data or [])}
+
+
+def fetch_order_items(client, order_ids, fields="*,menu_items(name,price)"):
+    """Fetch the items of several orders, grouped by order id.
+
+    One query, unless the items exceed `SUPABASE_MAX_ROWS`.
+    """
+    order_ids = _unique(order_ids)
+    grouped = {oid: [] for oid in order_ids}
+    if not order_ids:
+        return grouped
+    page_size = Config.SUPABASE_MAX_ROWS
+    start = 0
+    while True:
+        res = (
+            client.table("order_items")
+            .select(fields)
+            .in_("order_id", order_ids)
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        rows = res.data or []
+        for row in rows:
+            grouped.setdefault(row.get("order_id"), []).append(row)
+        if len(rows) < page_size:
+            return grouped
+        start += page_size
+
+
+def enrich_orders(
+    client,
+    orders,
+    user_fields="name,phone,telegram_id",
+    stall_fields="name",
+    item_fields="*,menu_items(name,price)",
+):
+    """Attach `user`, `stall` and `items` to every order in place.
+
+    Pass `None` for any of the field lists to skip that relation.  At most
+    three queries are issued, however many orders are given, and they run
+    concurrently.
+    """
+    if not orders:
+        return orders
+
+    lookups = {}
+    if user_fields is not None:
+        user_ids = [o.get("user_id") for o in orders]
+        lookups["users"] = lambda: fetch_by_ids(client, "users", user_fields, user_ids)
+    if stall_fields is not None:
+        stall_ids = [o.get("stall_id") for o in orders]
+        lookups["stalls"] = lambda: fetch_by_ids(client, "food_stalls", stall_fields, stall_ids)
+    if item_fields is not None:
+        order_ids = [o.get("id") for o in orders]
+        lookups["items"] = lambda: fetch_order_items(client, order_ids, item_fields)
+    # the lookups are independent of each other: run them at the same time
+    found = run_concurrently(lookups)
+    users = found.get("users", {})
+    stalls = found.get("stalls", {})
+    items = found.get("items", {})
+
+    for order in orders:
+        if user_fields is not None:
+            order["user"] = users.get(order.get("user_id"))
+        if stall_fields is not None:
+            order["stall"] = stalls.get(order.get("stall_id"))
+        if item_fields is not None:
+            order["items"] = items.get(order.get("id"), [])
+    return orders
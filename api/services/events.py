@@ -0,0 +1,249 @@
+"""
+Event Hub
+=========
+In-process publish/subscribe for live order updates, served as
+Server-Sent Events (SSE).
+
+Order handlers `publish` events to topics (e.g. "admin"); each open stream
+holds a `Subscription` with a bounded buffer.  The hub also keeps a short
+history so a client that reconnects with `Last-Event-ID` gets the events it
+missed, and a subscriber that falls behind is caught up from that history
+instead of blocking publishers.
+
+Event ids look like "<epoch>-<n>", where the epoch is unique to this hub.
+An id from another process or an earlier run cannot be resumed from; those
+clients get a "reset" event telling them to reload their list.  Each gunicorn
+worker has its own hub, so the stream only carries events published by the
+same worker; run the API with a single (threaded) worker per instance, or
+put a shared broker behind `publish` before scaling out.
+
+Every open stream and long-poll is a subscriber and, in the threaded
+serving mode, holds a worker thread.  The hub accepts at most
+`EVENT_SUBSCRIBERS_MAX` of them and raises `TooManySubscribers` beyond that
+(a 503 with Retry-After), so live clients cannot starve other requests of
+threads.
+"""
+
+import itertools
+import json
+import secrets
+import threading
+import time
+from collections import deque
+
+from flask import Response, stream_with_context
+
+from api.config import Config
+
+RESET = "reset"
+
+
+class TooManySubscribers(Exception):
+    """Raised when the hub already has its maximum number of subscribers."""
+
+
+class Subscription:
+    """One stream's view of the hub: a bounded buffer of pending events."""
+
+    def __init__(self, hub, topics, buffer_size, last_id):
+        self.hub = hub
+        self.topics = frozenset(topics)
+        self.last_id = last_id
+        self.lagged = False
+        self._buffer = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+
+    def _push(self, event):
+        with self._cond:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.lagged = True
+            self._buffer.append(event)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Return the next batch of events, or [] after `timeout` seconds."""
+        with self._cond:
+            if not self._buffer and not self.lagged:
+                self._cond.wait(timeout)
+            if self.lagged:
+                self.lagged = False
+                self._buffer.clear()
+                events = self.hub.since(self.last_id, self.topics)
+            else:
+                events = list(self._buffer)
+                self._buffer.clear()
+        return self.advance(events)
+
+    def advance(self, events):
+        """Drop events already delivered and remember the newest one."""
+        last_seq = self.hub._seq_of(self.last_id) or 0
+        fresh = [e for e in events if e["id"] is None or e["seq"] > last_seq]
+        for event in fresh:
+            if event["id"] is not None:
+                self.last_id = event["id"]
+        return fresh
+
+
+class EventHub:
+    def __init__(self, history_size=1000, buffer_size=100, max_subscribers=None):
+        self.epoch = secrets.token_hex(4)
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._counter = itertools.count(1)
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.rejected = 0
+
+    def publish(self, topics, event_type, data):
+        """Send an event to every subscriber of any of `topics`."""
+        topics = frozenset(topics)
+        with self._lock:
+            seq = next(self._counter)
+            event = {
+                "id": f"{self.epoch}-{seq}",
+                "seq": seq,
+                "type": event_type,
+                "topics": topics,
+                "data": data,
+                "time": time.time(),
+            }
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if s.topics & topics]
+            self.published += 1
+        for sub in subscribers:
+            sub._push(event)
+        return event
+
+    def _seq_of(self, event_id):
+        """Sequence number of an id from this hub, or None."""
+        epoch, _, seq = (event_id or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, last_id, topics):
+        """Events on `topics` after `last_id`, or a reset if they are gone."""
+        seq = self._seq_of(last_id)
+        with self._lock:
+            history = list(self._history)
+        if seq is None or (history and history[0]["seq"] > seq + 1):
+            return [{"id": None, "type": RESET, "data": {}}]
+        return [e for e in history if e["seq"] > seq and e["topics"] & topics]
+
+    def subscribe(self, topics, last_event_id=None):
+        """Open a subscription.
+
+        Returns `(subscription, events to replay first, head id)`.  The head
+        id is the newest event id at the moment of subscribing, so every
+        later event reaches the subscription.  Raises TooManySubscribers
+        when `max_subscribers` are already open.
+        """
+        sub = Subscription(self, topics, self.buffer_size, last_event_id)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                raise TooManySubscribers(f"{len(self._subscribers)} live connections are open")
+            self._subscribers.add(sub)
+            head = self._history[-1]["id"] if self._history else f"{self.epoch}-0"
+        replay = self.since(last_event_id, sub.topics) if last_event_id else []
+        # events published while subscribing may also be buffered; advance()
+        # makes sure each is sent once
+        return sub, sub.advance(replay), head
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "rejected": self.rejected,
+            "history": len(self._history),
+            "published": self.published,
+        }
+
+
+hub = EventHub(
+    history_size=Config.EVENT_HISTORY_SIZE,
+    buffer_size=Config.EVENT_BUFFER_SIZE,
+    max_subscribers=Config.EVENT_SUBSCRIBERS_MAX,
+)
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+def publish_order_event(event_type, order):
+    """Publish an order lifecycle event to the admin queue and its owner."""
+    topics = ["admin"]
+    if order.get("user_id"):
+        topics.append(user_topic(order["user_id"]))
+    hub.publish(topics, event_type, order)
+
+
+def _format(event):
+    lines = []
+    if event["id"] is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'], default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_response(topics, last_event_id=None):
+    """Stream events on `topics` to the client as text/event-stream.
+
+    Sends a comment every `SSE_HEARTBEAT` seconds to keep proxies from
+    closing an idle connection, and ends the stream after
+    `SSE_MAX_DURATION` seconds so worker threads are recycled; browsers
+    reconnect on their own and resume with Last-Event-ID.
+    """
+    sub, replay, _ = hub.subscribe(topics, last_event_id)
+
+    def generate():
+        deadline = time.monotonic() + Config.SSE_MAX_DURATION
+        try:
+            yield "retry: 3000\n\n"
+            for event in replay:
+                yield _format(event)
+            while time.monotonic() < deadline:
+                events = sub.wait(Config.SSE_HEARTBEAT)
+                if not events:
+                    yield ": keep-alive\n\n"
+                for event in events:
+                    yield _format(event)
+        finally:
+            hub.unsubscribe(sub)
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # also frees the slot if the client leaves before the stream starts
+    response.call_on_close(lambda: hub.unsubscribe(sub))
+    return response
+
+
+def poll_events(topics, since=None, timeout=25.0):
+    """Long-poll alternative to `sse_response` for clients without SSE.
+
+    Returns at once if events after `since` are available, otherwise waits
+    up to `timeout` seconds for the next one.  The returned `last_event_id`
+    is the `since` to send with the next poll.
+    """
+    sub, replay, head = hub.subscribe(topics, since)
+    try:
+        events = replay or sub.wait(timeout)
+    finally:
+        hub.unsubscribe(sub)
+    # without a valid position of its own, resume from the head seen when
+    # subscribing: anything published since then is replayed on the next poll
+    return {
+        "events": [{"id": e["id"], "type": e["type"], "data": e["data"]} for e in events],
+        "last_event_id": sub.last_id if hub._seq_of(sub.last_id) else head,
+    }
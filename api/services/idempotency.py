@@ -0,0 +1,110 @@
+"""
+Idempotency Store
+=================
+Remembers the responses of requests sent with an `Idempotency-Key` header.
+
+A retried request with the same key gets the stored response back instead of
+running the handler again, and a duplicate that arrives while the first
+request is still running waits for it to finish.
+
+The backend is pluggable: `Config.IDEMPOTENCY_STORE` names a class with the
+`IdempotencyStore` interface.  The default keeps keys in process memory,
+which is enough for one worker; a shared backend (e.g. Redis) is needed for
+duplicates to be caught across workers.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+
+from werkzeug.utils import import_string
+
+from api.config import Config
+from api.services.cache import TTLCache
+
+# outcomes of IdempotencyStore.begin
+OWNER = "owner"  # first request with this key: run the handler
+REPLAY = "replay"  # a response is stored: return it
+MISMATCH = "mismatch"  # key reused with a different request body
+IN_PROGRESS = "in_progress"  # first request still running after waiting
+
+
+class IdempotencyStore(ABC):
+    """Interface for idempotency backends."""
+
+    @abstractmethod
+    def begin(self, key, fingerprint, wait=10.0):
+        """Claim `key` or report what happened to it.
+
+        Returns `(outcome, record)`; `record` is the stored response for
+        REPLAY and None otherwise.  Blocks up to `wait` seconds while another
+        request holds the key.
+        """
+
+    @abstractmethod
+    def complete(self, key, fingerprint, record):
+        """Store the response for a key claimed with `begin`."""
+
+    @abstractmethod
+    def release(self, key):
+        """Give up a claimed key without storing anything, allowing retries."""
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Per-process store: completed responses in a TTL/LRU cache."""
+
+    def __init__(self, maxsize=10000, ttl=86400):
+        self._done = TTLCache(maxsize=maxsize, ttl=ttl, name="idempotency")
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key, fingerprint, wait=10.0):
+        while True:
+            with self._lock:
+                done = self._done.get(key)
+                if done is not None:
+                    stored_fingerprint, record = done
+                    if stored_fingerprint != fingerprint:
+                        return MISMATCH, None
+                    return REPLAY, record
+                running = self._running.get(key)
+                if running is None:
+                    self._running[key] = (fingerprint, threading.Event())
+                    return OWNER, None
+            running_fingerprint, event = running
+            if running_fingerprint != fingerprint:
+                return MISMATCH, None
+            if not event.wait(wait):
+                return IN_PROGRESS, None
+
+    def complete(self, key, fingerprint, record):
+        with self._lock:
+            self._done.set(key, (fingerprint, record))
+            running = self._running.pop(key, None)
+        if running:
+            running[1].set()
+
+    def release(self, key):
+        with self._lock:
+            running = self._running.pop(key, None)
+        if running:
+            running[1].set()
+
+    def stats(self):
+        return self._done.stats()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the configured store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store_cls = import_string(Config.IDEMPOTENCY_STORE)
+                _store = store_cls(
+                    maxsize=Config.IDEMPOTENCY_MAX_KEYS, ttl=Config.IDEMPOTENCY_TTL
+                )
+    return _store
@@ -0,0 +1,988 @@
+"""
+In-Memory Backend
+=================
+A stand-in for Supabase that keeps every table in process memory.
+
+With `SUPABASE_BACKEND=memory`, `SupabaseService` hands out a `MemoryClient`
+instead of a supabase-py client, so the real blueprints run without a
+Supabase project: locally, in CI and in benchmarks.  It implements the part
+of the PostgREST client this API uses:
+
+- `select` with column lists, embedded resources and aliases
+  (`*,stall:food_stalls(name)`) and `count="exact"`;
+- filters `eq`, `neq`, `gt`, `gte`, `lt`, `lte`, `in_`, `like`, `ilike`,
+  `is_`, `not_` and `or_`, plus `order`, `limit`, `range` and `single`;
+- `insert`, `update`, `upsert` and `delete`, returning the affected rows;
+- `rpc("place_order")`, mirroring the SQL function in docs/DB_SCHEMA.md;
+- `auth.sign_up`, `sign_in_with_password`, `sign_out` and `get_user`,
+  issuing HS256 tokens signed with `SUPABASE_JWT_SECRET` when it is set.
+
+Defaults, NOT NULL and CHECK constraints and primary keys of the schema are
+enforced, and the stats rollup tables are maintained the way the database
+triggers do.  Errors are raised as postgrest `APIError`s with the codes
+PostgREST uses, so error handling paths behave as in production.
+
+Each `execute()` first sleeps `MEMORY_LATENCY_MS` plus a random
+0..`MEMORY_JITTER_MS` to reproduce a network round-trip.  The sleep happens
+outside the data lock, so concurrent requests overlap as they would against
+a real database.
+"""
+
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from postgrest.exceptions import APIError
+
+from api.config import Config
+
+CATEGORIES = ("main", "snack", "beverage", "dessert")
+ORDER_STATUSES = ("pending", "approved", "rejected", "ready", "completed")
+PAID_STATUSES = ("approved", "ready", "completed")
+
+SERIAL_TABLES = ("food_stalls", "menu_items", "orders", "order_items")
+PRIMARY_KEYS = {
+    "stats_daily_stall": ("day", "stall_id"),
+    "stats_daily_item": ("day", "menu_item_id"),
+    "stats_item_totals": ("menu_item_id",),
+    "stats_status_counts": ("stall_id", "status"),
+}
+DEFAULTS = {
+    "users": {"phone": None, "telegram_id": None, "role": "student"},
+    "food_stalls": {"description": None, "image_url": None, "is_active": True},
+    "menu_items": {"description": None, "image_url": None, "is_available": True, "stock": None},
+    "orders": {"status": "pending", "rejection_reason": None, "estimated_time": None},
+}
+TIMESTAMPED = ("users", "food_stalls", "menu_items", "orders")
+NOT_NULL = {
+    "users": ("id", "name", "email"),
+    "food_stalls": ("name",),
+    "menu_items": ("stall_id", "name", "price", "category"),
+    "orders": ("user_id", "stall_id", "total_amount"),
+    "order_items": ("order_id", "menu_item_id", "quantity", "price_at_order"),
+}
+CHECKS = {
+    "users": {"role": lambda v: v in ("student", "admin")},
+    "menu_items": {
+        "price": lambda v: v >= 0,
+        "stock": lambda v: v is None or v >= 0,
+        "category": lambda v: v in CATEGORIES,
+    },
+    "orders": {"status": lambda v: v in ORDER_STATUSES, "total_amount": lambda v: v >= 0},
+    "order_items": {"quantity": lambda v: v > 0, "price_at_order": lambda v: v >= 0},
+}
+# (table, column) -> referenced table, used to resolve embedded selects
+FOREIGN_KEYS = {
+    ("menu_items", "stall_id"): "food_stalls",
+    ("orders", "user_id"): "users",
+    ("orders", "stall_id"): "food_stalls",
+    ("order_items", "order_id"): "orders",
+    ("order_items", "menu_item_id"): "menu_items",
+    ("stats_daily_stall", "stall_id"): "food_stalls",
+    ("stats_daily_item", "menu_item_id"): "menu_items",
+    ("stats_item_totals", "menu_item_id"): "menu_items",
+}
+
+# the seed data of docs/DB_SCHEMA.md
+DEMO_SEED = {
+    "food_stalls": [
+        {"name": "South Indian Corner",
+         "description": "Authentic South Indian breakfast and snacks"},
+        {"name": "Juice & Snacks Bar", "description": "Fresh juices, sandwiches, and quick bites"},
+        {"name": "North Indian Dhaba", "description": "Roti, sabzi, dal, and rice meals"},
+    ],
+    "menu_items": [
+        {"stall_id": 1, "name": "Masala Dosa", "description": "Crispy dosa with potato filling",
+         "price": 40.0, "category": "main"},
+        {"stall_id": 1, "name": "Idli (2 pcs)",
+         "description": "Steamed rice cakes with sambar and chutney",
+         "price": 20.0, "category": "main"},
+        {"stall_id": 1, "name": "Vada (2 pcs)", "description": "Deep fried lentil donuts",
+         "price": 25.0, "category": "snack"},
+        {"stall_id": 1, "name": "Filter Coffee",
+         "description": "Traditional South Indian filter coffee",
+         "price": 15.0, "category": "beverage"},
+        {"stall_id": 2, "name": "Mango Juice", "description": "Fresh mango juice",
+         "price": 30.0, "category": "beverage"},
+        {"stall_id": 2, "name": "Veg Sandwich", "description": "Grilled vegetable sandwich",
+         "price": 35.0, "category": "snack"},
+        {"stall_id": 2, "name": "Samosa (2 pcs)", "description": "Crispy potato samosas",
+         "price": 20.0, "category": "snack"},
+        {"stall_id": 3, "name": "Roti Sabzi",
+         "description": "3 rotis with seasonal vegetable curry",
+         "price": 50.0, "category": "main"},
+        {"stall_id": 3, "name": "Dal Rice", "description": "Dal tadka with steamed rice",
+         "price": 45.0, "category": "main"},
+        {"stall_id": 3, "name": "Curd Rice", "description": "Yogurt rice with tempering",
+         "price": 30.0, "category": "main"},
+    ],
+}
+
+
+def _api_error(message, code, details=None):
+    return APIError({"message": message, "code": code, "details": details, "hint": None})
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ── select / filter parsing ──────────────────────
+
+
+def _split(text):
+    """Split on top-level commas, leaving parentheses and quotes intact."""
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+_EMBED = re.compile(r"(?:(\w+):)?(\w+)(?:!\w+)?\((.*)\)", re.S)
+
+
+def parse_select(columns):
+    """Parse a select list such as `"*,alias:table(cols)"`.
+
+    Returns `("*",)`, `("column", alias, name)` and
+    `("embed", alias, table, fields)` entries.
+    """
+    fields = []
+    for part in _split(columns or "*"):
+        match = _EMBED.fullmatch(part)
+        if match:
+            alias, table, inner = match.groups()
+            fields.append(("embed", alias or table, table, parse_select(inner)))
+        elif part == "*":
+            fields.append(("*",))
+        else:
+            alias, _, name = part.rpartition(":")
+            fields.append(("column", alias or name, name))
+    return fields
+
+
+def _cast(value, like):
+    """Coerce a filter value to the type of the stored value it is compared with."""
+    if value is None or like is None or isinstance(value, type(like)):
+        return value
+    try:
+        if isinstance(like, bool):
+            return str(value).lower() in ("true", "t", "1")
+        if isinstance(like, int):
+            return int(value)
+        if isinstance(like, float):
+            return float(value)
+        if isinstance(like, str):
+            return str(value)
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def _pattern(pattern, flags=0):
+    regex = "".join(
+        ".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in str(pattern)
+    )
+    return re.compile(regex, flags | re.S)
+
+
+def _compare(op, value):
+    """Predicate on a stored value for a PostgREST operator."""
+    if op in ("like", "ilike"):
+        regex = _pattern(value.replace("*", "%"), re.I if op == "ilike" else 0)
+        return lambda v: v is not None and regex.fullmatch(str(v)) is not None
+    if op == "is":
+        target = {"null": None, "true": True, "false": False}.get(str(value).lower(), value)
+        return lambda v: v is target or v == target
+    if op == "in":
+        values = list(value)
+        return lambda v: v is not None and v in [_cast(x, v) for x in values]
+    test = {
+        "eq": lambda a, b: a == b,
+        "neq": lambda a, b: a != b,
+        "gt": lambda a, b: a > b,
+        "gte": lambda a, b: a >= b,
+        "lt": lambda a, b: a < b,
+        "lte": lambda a, b: a <= b,
+    }.get(op)
+    if test is None:
+        raise _api_error(f"Unsupported operator {op}", "PGRST100")
+    return lambda v: v is not None and value is not None and test(v, _cast(value, v))
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _parse_condition(text):
+    """Predicate for one `or_()` item: `col.op.value`, `and(...)`, `not.or(...)`."""
+    negate = text.startswith("not.")
+    if negate:
+        text = text[4:]
+    match = re.fullmatch(r"(and|or)\((.*)\)", text, re.S)
+    if match:
+        predicates = [_parse_condition(p) for p in _split(match.group(2))]
+        combine = all if match.group(1) == "and" else any
+        predicate = lambda row: combine(p(row) for p in predicates)  # noqa: E731
+    else:
+        column, op, value = text.split(".", 2)
+        if op == "not":
+            negate = not negate
+            op, value = value.split(".", 1)
+        if op == "in":
+            value = [_unquote(v) for v in _split(value.strip("()"))]
+        else:
+            value = _unquote(value)
+        test = _compare(op, value)
+        predicate = lambda row: test(row.get(column))  # noqa: E731
+    if negate:
+        return lambda row: not predicate(row)
+    return predicate
+
+
+# ── results ──────────────────────────────────────
+
+
+class MemoryResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+# ── query builder ────────────────────────────────
+
+
+class MemoryQuery:
+    """Chainable query on one table, executed against a `MemoryDatabase`."""
+
+    def __init__(self, db, table):
+        self._db = db
+        self._table = table
+        self._op = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._options = {}
+        self._filters = []
+        self._negate = False
+        self._order = []
+        self._offset = 0
+        self._limit = None
+        self._single = False
+
+    # operations
+
+    def select(self, *columns, count=None, head=None):
+        self._columns = ",".join(columns) or "*"
+        self._count = count
+        return self
+
+    def insert(self, json, *, count=None, returning=None, upsert=False, default_to_null=True):
+        self._op = "upsert" if upsert else "insert"
+        self._payload = json
+        self._count = count
+        self._options = {"default_to_null": default_to_null}
+        return self
+
+    def upsert(self, json, *, count=None, returning=None, ignore_duplicates=False,
+               on_conflict="", default_to_null=True):
+        self._op = "upsert"
+        self._payload = json
+        self._count = count
+        self._options = {
+            "default_to_null": default_to_null,
+            "ignore_duplicates": ignore_duplicates,
+            "on_conflict": on_conflict,
+        }
+        return self
+
+    def update(self, json, *, count=None, returning=None):
+        self._op = "update"
+        self._payload = json
+        self._count = count
+        return self
+
+    def delete(self, *, count=None, returning=None):
+        self._op = "delete"
+        self._count = count
+        return self
+
+    # filters
+
+    def _filter(self, column, predicate):
+        if self._negate:
+            self._negate = False
+            test = predicate
+            predicate = lambda v: not test(v)  # noqa: E731
+        self._filters.append(lambda row: predicate(row.get(column)))
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, _compare("eq", value))
+
+    def neq(self, column, value):
+        return self._filter(column, _compare("neq", value))
+
+    def gt(self, column, value):
+        return self._filter(column, _compare("gt", value))
+
+    def gte(self, column, value):
+        return self._filter(column, _compare("gte", value))
+
+    def lt(self, column, value):
+        return self._filter(column, _compare("lt", value))
+
+    def lte(self, column, value):
+        return self._filter(column, _compare("lte", value))
+
+    def like(self, column, pattern):
+        return self._filter(column, _compare("like", pattern))
+
+    def ilike(self, column, pattern):
+        return self._filter(column, _compare("ilike", pattern))
+
+    def is_(self, column, value):
+        return self._filter(column, _compare("is", value))
+
+    def in_(self, column, values):
+        return self._filter(column, _compare("in", values))
+
+    def or_(self, filters, reference_table=None):
+        predicate = _parse_condition(f"or({filters})")
+        if self._negate:
+            self._negate = False
+            inner = predicate
+            predicate = lambda row: not inner(row)  # noqa: E731
+        self._filters.append(predicate)
+        return self
+
+    # modifiers
+
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        self._order.append((column, desc, desc if nullsfirst is None else nullsfirst))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self._limit = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def execute(self):
+        self._db.delay()
+        return self._db.run(self)
+
+
+class MemoryRPC:
+    def __init__(self, db, name, params):
+        self._db = db
+        self._name = name
+        self._params = params or {}
+
+    def execute(self):
+        self._db.delay()
+        return self._db.call(self._name, self._params)
+
+
+# ── auth ─────────────────────────────────────────
+
+
+class AuthError(Exception):
+    """Raised by `MemoryAuth.get_user` for an invalid or expired token."""
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+class MemoryAuth:
+    """Email/password accounts issuing HS256 JWTs like Supabase Auth."""
+
+    def __init__(self, db):
+        self._db = db
+
+    def _secret(self):
+        return (Config.SUPABASE_JWT_SECRET or self._db.jwt_secret).encode()
+
+    def _token(self, account):
+        header = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+        claims = {
+            "sub": account["id"],
+            "email": account["email"],
+            "role": "authenticated",
+            "exp": int(time.time()) + 3600,
+        }
+        payload = _b64(json.dumps(claims).encode())
+        signature = hmac.new(self._secret(), f"{header}.{payload}".encode(), hashlib.sha256)
+        return f"{header}.{payload}.{_b64(signature.digest())}"
+
+    def _session(self, account):
+        user = {"id": account["id"], "email": account["email"]}
+        session = {
+            "access_token": self._token(account),
+            "refresh_token": secrets.token_urlsafe(16),
+            "token_type": "bearer",
+            "expires_in": 3600,
+        }
+        return {"user": user, "session": session}
+
+    def _hash(self, password, salt):
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 1000).hex()
+
+    def sign_up(self, credentials):
+        email = (credentials.get("email") or "").lower()
+        with self._db.lock:
+            if email in self._db.accounts:
+                return {"error": {"message": "User already registered"}}
+            salt = secrets.token_bytes(8)
+            account = {
+                "id": str(uuid.uuid4()),
+                "email": email,
+                "salt": salt,
+                "password": self._hash(credentials.get("password", ""), salt),
+            }
+            self._db.accounts[email] = account
+        return self._session(account)
+
+    def sign_in_with_password(self, credentials):
+        account = self._db.accounts.get((credentials.get("email") or "").lower())
+        password = credentials.get("password", "")
+        if account is None or not hmac.compare_digest(
+            account["password"], self._hash(password, account["salt"])
+        ):
+            return {"error": {"message": "Invalid login credentials"}}
+        return self._session(account)
+
+    def sign_out(self):
+        return None
+
+    def get_user(self, jwt=None):
+        try:
+            header, payload, signature = (jwt or "").split(".")
+            expected = hmac.new(self._secret(), f"{header}.{payload}".encode(), hashlib.sha256)
+            if not hmac.compare_digest(_b64(expected.digest()), signature):
+                raise AuthError("Invalid token signature")
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except (ValueError, TypeError) as exc:
+            raise AuthError("Invalid token") from exc
+        if claims.get("exp", 0) <= time.time():
+            raise AuthError("Token expired")
+        return {"user": {"id": claims["sub"], "email": claims.get("email")}}
+
+
+# ── database ─────────────────────────────────────
+
+
+class MemoryDatabase:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.lock = threading.RLock()
+        self.tables = {}  # name -> {primary key: row}
+        self.accounts = {}  # email -> auth account
+        self.jwt_secret = secrets.token_hex(16)
+        self._serials = {}
+        self.round_trips = 0
+        self.by_table = {}
+        self.auth = MemoryAuth(self)
+
+    # ── setup ──
+
+    def seed(self, data):
+        """Insert `{table: [rows]}`, applying defaults and triggers."""
+        with self.lock:
+            for table, rows in data.items():
+                self._insert(table, [dict(r) for r in rows], default_to_null=False)
+
+    def create_user(self, email, password, name, role="student", **profile):
+        """Register an auth account with its `users` row; returns the user id."""
+        res = self.auth.sign_up({"email": email, "password": password})
+        if "error" in res:
+            raise ValueError(res["error"]["message"])
+        user_id = res["user"]["id"]
+        profile = {"id": user_id, "email": email, "name": name, "role": role, **profile}
+        self.seed({"users": [profile]})
+        return user_id
+
+    def reset_stats(self):
+        with self.lock:
+            self.round_trips = 0
+            self.by_table = {}
+
+    def stats(self):
+        with self.lock:
+            return {
+                "round_trips": self.round_trips,
+                "by_table": dict(self.by_table),
+                "rows": {name: len(rows) for name, rows in self.tables.items()},
+            }
+
+    # ── execution ──
+
+    def delay(self):
+        """Sleep for one simulated network round-trip."""
+        seconds = (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000.0
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _count(self, name):
+        self.round_trips += 1
+        self.by_table[name] = self.by_table.get(name, 0) + 1
+
+    def run(self, query):
+        with self.lock:
+            self._count(query._table)
+            handler = getattr(self, f"_run_{query._op}")
+            rows = handler(query)
+            count = len(rows) if query._count else None
+            if query._op == "select":
+                rows = self._sort(rows, query._order)
+                end = None if query._limit is None else query._offset + query._limit
+                rows = rows[query._offset:end]
+            fields = parse_select(query._columns)
+            data = [self._project(query._table, row, fields) for row in rows]
+        if query._single:
+            if len(data) != 1:
+                raise _api_error(
+                    "JSON object requested, multiple (or no) rows returned",
+                    "PGRST116",
+                    f"The result contains {len(data)} rows",
+                )
+            return MemoryResponse(data[0], count)
+        return MemoryResponse(data, count)
+
+    def call(self, name, params):
+        with self.lock:
+            self._count(f"rpc/{name}")
+            handler = getattr(self, f"_rpc_{name}", None)
+            if handler is None:
+                raise _api_error(
+                    f"Could not find the function public.{name} in the schema cache", "PGRST202"
+                )
+            return MemoryResponse(handler(params))
+
+    def _rows(self, table):
+        return self.tables.setdefault(table, {})
+
+    def _matching(self, query):
+        return [r for r in self._rows(query._table).values() if all(f(r) for f in query._filters)]
+
+    def _sort(self, rows, order):
+        rows = list(rows)
+        for column, desc, nullsfirst in reversed(order):
+            # stable sorts, last key first; NULLs go where nullsfirst says
+            nulls = [r for r in rows if r.get(column) is None]
+            rest = sorted(
+                (r for r in rows if r.get(column) is not None),
+                key=lambda r: r[column],
+                reverse=desc,
+            )
+            rows = nulls + rest if nullsfirst else rest + nulls
+        return rows
+
+    def _project(self, table, row, fields):
+        out = {}
+        for field in fields:
+            if field[0] == "*":
+                out.update(row)
+            elif field[0] == "column":
+                out[field[1]] = row.get(field[2])
+            else:
+                _, alias, target, sub = field
+                out[alias] = self._embed(table, row, target, sub)
+        return out
+
+    def _embed(self, table, row, target, fields):
+        for (source, column), referenced in FOREIGN_KEYS.items():
+            if source == table and referenced == target:
+                related = self._rows(target).get(row.get(column))
+                return None if related is None else self._project(target, related, fields)
+        for (source, column), referenced in FOREIGN_KEYS.items():
+            if source == target and referenced == table:
+                return [
+                    self._project(target, r, fields)
+                    for r in self._rows(target).values()
+                    if r.get(column) == row.get("id")
+                ]
+        raise _api_error(
+            f"Could not find a relationship between '{table}' and '{target}'", "PGRST200"
+        )
+
+    # ── writes ──
+
+    def _key(self, table, row):
+        columns = PRIMARY_KEYS.get(table, ("id",))
+        return row.get(columns[0]) if len(columns) == 1 else tuple(row.get(c) for c in columns)
+
+    def _validate(self, table, row):
+        for column in NOT_NULL.get(table, ()):
+            if row.get(column) is None:
+                raise _api_error(
+                    f'null value in column "{column}" of relation "{table}" '
+                    "violates not-null constraint",
+                    "23502",
+                )
+        for column, check in CHECKS.get(table, {}).items():
+            if row.get(column) is not None and not check(row[column]):
+                raise _api_error(
+                    f'new row for relation "{table}" violates check constraint '
+                    f'"{table}_{column}_check"',
+                    "23514",
+                )
+
+    def _new_row(self, table, payload, columns):
+        row = {c: None for c in columns}
+        row.update(DEFAULTS.get(table, {}))
+        row.update(payload)
+        if table in SERIAL_TABLES and row.get("id") is None:
+            serial = self._serials.setdefault(table, itertools.count(1))
+            row["id"] = next(serial)
+            while row["id"] in self._rows(table):
+                row["id"] = next(serial)
+        if table in TIMESTAMPED or table == "order_items":
+            now = _now()
+            row.setdefault("created_at", now)
+            row["created_at"] = row["created_at"] or now
+            if table in TIMESTAMPED:
+                row["updated_at"] = row.get("updated_at") or now
+        return row
+
+    def _insert(self, table, payload, default_to_null=True):
+        payload = payload if isinstance(payload, list) else [payload]
+        # like PostgREST, a bulk insert sends the union of the rows' keys and
+        # missing keys become NULL unless default_to_null is off
+        columns = set().union(*payload) if default_to_null and len(payload) > 1 else set()
+        rows = [self._new_row(table, p, columns) for p in payload]
+        existing = self._rows(table)
+        keys = set()
+        for row in rows:
+            self._validate(table, row)
+            key = self._key(table, row)
+            if key in existing or key in keys:
+                raise _api_error(
+                    f'duplicate key value violates unique constraint "{table}_pkey"', "23505"
+                )
+            keys.add(key)
+        for row in rows:
+            existing[self._key(table, row)] = row
+            self._after_insert(table, row)
+        return rows
+
+    def _update_row(self, table, old, changes):
+        new = {**old, **changes}
+        if table in TIMESTAMPED and "updated_at" not in changes:
+            new["updated_at"] = _now()
+        self._validate(table, new)
+        return new
+
+    def _run_select(self, query):
+        return self._matching(query)
+
+    def _run_insert(self, query):
+        return self._insert(query._table, query._payload, query._options["default_to_null"])
+
+    def _run_update(self, query):
+        table = self._rows(query._table)
+        matched = self._matching(query)
+        updated = [self._update_row(query._table, old, query._payload) for old in matched]
+        for old, new in zip(matched, updated):
+            table[self._key(query._table, new)] = new
+            self._after_update(query._table, old, new)
+        return updated
+
+    def _run_delete(self, query):
+        table = self._rows(query._table)
+        matched = self._matching(query)
+        for row in matched:
+            self._before_delete(query._table, row)
+            del table[self._key(query._table, row)]
+            self._after_delete(query._table, row)
+        return matched
+
+    def _run_upsert(self, query):
+        name = query._table
+        table = self._rows(name)
+        payload = query._payload if isinstance(query._payload, list) else [query._payload]
+        on_conflict = query._options.get("on_conflict") or ""
+        conflict = [c.strip() for c in on_conflict.split(",") if c.strip()]
+        result = []
+        for values in payload:
+            if conflict:
+                current = next(
+                    (r for r in table.values() if all(r.get(c) == values.get(c) for c in conflict)),
+                    None,
+                )
+            else:
+                current = table.get(self._key(name, values))
+            if current is None:
+                result.extend(self._insert(name, [values], query._options["default_to_null"]))
+            elif not query._options.get("ignore_duplicates"):
+                new = self._update_row(name, current, values)
+                del table[self._key(name, current)]
+                table[self._key(name, new)] = new
+                self._after_update(name, current, new)
+                result.append(new)
+        return result
+
+    # ── stats rollups (the triggers of docs/DB_SCHEMA.md) ──
+
+    def _bump(self, table, key_values, **deltas):
+        rows = self._rows(table)
+        key = self._key(table, key_values)
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {**key_values, **{c: 0 for c in deltas}}
+        for column, delta in deltas.items():
+            row[column] += delta
+
+    def _after_insert(self, table, row):
+        if table == "orders":
+            day = row["created_at"][:10]
+            paid = row["status"] in PAID_STATUSES
+            self._bump(
+                "stats_daily_stall",
+                {"day": day, "stall_id": row["stall_id"]},
+                order_count=1,
+                revenue=float(row["total_amount"]) if paid else 0.0,
+            )
+            self._bump(
+                "stats_status_counts",
+                {"stall_id": row["stall_id"], "status": row["status"]},
+                order_count=1,
+            )
+        elif table == "order_items":
+            order = self._rows("orders").get(row["order_id"])
+            if order is None:
+                raise _api_error(
+                    'insert or update on table "order_items" violates foreign key constraint',
+                    "23503",
+                )
+            self._bump(
+                "stats_daily_item",
+                {"day": order["created_at"][:10], "menu_item_id": row["menu_item_id"],
+                 "stall_id": order["stall_id"]},
+                quantity=row["quantity"],
+            )
+            self._bump(
+                "stats_item_totals",
+                {"menu_item_id": row["menu_item_id"], "stall_id": order["stall_id"]},
+                quantity=row["quantity"],
+            )
+
+    def _after_update(self, table, old, new):
+        if table != "orders" or old["status"] == new["status"]:
+            return
+        self._bump("stats_status_counts", {"stall_id": old["stall_id"], "status": old["status"]},
+                   order_count=-1)
+        self._bump("stats_status_counts", {"stall_id": new["stall_id"], "status": new["status"]},
+                   order_count=1)
+        was_paid, is_paid = old["status"] in PAID_STATUSES, new["status"] in PAID_STATUSES
+        if was_paid != is_paid:
+            amount = float(new["total_amount"])
+            self._bump(
+                "stats_daily_stall",
+                {"day": new["created_at"][:10], "stall_id": new["stall_id"]},
+                order_count=0,
+                revenue=amount if is_paid else -amount,
+            )
+
+    def _before_delete(self, table, row):
+        if table != "orders":
+            return
+        items = [i for i in self._rows("order_items").values() if i["order_id"] == row["id"]]
+        for item in items:
+            self._bump(
+                "stats_daily_item",
+                {"day": row["created_at"][:10], "menu_item_id": item["menu_item_id"],
+                 "stall_id": row["stall_id"]},
+                quantity=-item["quantity"],
+            )
+            self._bump(
+                "stats_item_totals",
+                {"menu_item_id": item["menu_item_id"], "stall_id": row["stall_id"]},
+                quantity=-item["quantity"],
+            )
+        # ON DELETE CASCADE
+        order_items = self._rows("order_items")
+        for item in items:
+            del order_items[self._key("order_items", item)]
+
+    def _after_delete(self, table, row):
+        if table != "orders":
+            return
+        paid = row["status"] in PAID_STATUSES
+        self._bump(
+            "stats_daily_stall",
+            {"day": row["created_at"][:10], "stall_id": row["stall_id"]},
+            order_count=-1,
+            revenue=-float(row["total_amount"]) if paid else 0.0,
+        )
+        self._bump(
+            "stats_status_counts",
+            {"stall_id": row["stall_id"], "status": row["status"]},
+            order_count=-1,
+        )
+
+    # ── functions ──
+
+    def _rpc_stats_range(self, params):
+        """Python twin of the stats_range SQL function."""
+        start, end = params.get("p_from"), params.get("p_to")
+        stall_id = params.get("p_stall_id")
+
+        def in_range(row):
+            return start <= row["day"] <= end and stall_id in (None, row["stall_id"])
+
+        per_stall = {}
+        for row in filter(in_range, self._rows("stats_daily_stall").values()):
+            entry = per_stall.setdefault(
+                row["stall_id"], {"stall_id": row["stall_id"], "orders": 0, "revenue": 0.0}
+            )
+            entry["orders"] += row["order_count"]
+            entry["revenue"] += row["revenue"]
+        items = {}
+        for row in filter(in_range, self._rows("stats_daily_item").values()):
+            items[row["menu_item_id"]] = items.get(row["menu_item_id"], 0) + row["quantity"]
+        menu = self._rows("menu_items")
+        top = sorted(items.items(), key=lambda kv: kv[1], reverse=True)[: params.get("p_top", 5)]
+        return {
+            "orders": sum(e["orders"] for e in per_stall.values()),
+            "revenue": sum(e["revenue"] for e in per_stall.values()),
+            "by_stall": [per_stall[k] for k in sorted(per_stall)],
+            "popular_items": [
+                {"name": (menu.get(item_id) or {}).get("name"), "count": count}
+                for item_id, count in top
+            ],
+        }
+
+    def _rpc_place_order(self, params):
+        """Python twin of the place_order SQL function; runs under the lock."""
+
+        def fail(message):
+            raise _api_error(message, "P0001")
+
+        items = params.get("p_items") or []
+        if not items:
+            fail("Order must contain at least one item")
+        menu = self._rows("menu_items")
+        found = [menu.get(i.get("menu_item_id")) for i in items]
+        if any(mi is None for mi in found):
+            fail("One or more menu items do not exist")
+        if any(mi["stall_id"] != params.get("p_stall_id") for mi in found):
+            fail("Item does not belong to the specified stall")
+        if not all(mi["is_available"] for mi in found):
+            fail("One or more items are not available")
+        if any(not isinstance(i.get("quantity"), int) or i["quantity"] <= 0 for i in items):
+            fail("Quantity must be a positive integer")
+
+        wanted = {}
+        for entry in items:
+            wanted[entry["menu_item_id"]] = wanted.get(entry["menu_item_id"], 0) + entry["quantity"]
+        for item_id, quantity in wanted.items():
+            stock = menu[item_id]["stock"]
+            if stock is not None and stock < quantity:
+                fail(f"Only {stock} left of item {item_id}")
+        for item_id, quantity in wanted.items():
+            if menu[item_id]["stock"] is not None:
+                menu[item_id] = self._update_row(
+                    "menu_items", menu[item_id], {"stock": menu[item_id]["stock"] - quantity}
+                )
+
+        total = sum(mi["price"] * i["quantity"] for mi, i in zip(found, items))
+        [order] = self._insert(
+            "orders",
+            {"user_id": params.get("p_user_id"), "stall_id": params.get("p_stall_id"),
+             "total_amount": total, "status": "pending"},
+        )
+        self._insert(
+            "order_items",
+            [
+                {"order_id": order["id"], "menu_item_id": i["menu_item_id"],
+                 "quantity": i["quantity"], "price_at_order": mi["price"]}
+                for mi, i in zip(found, items)
+            ],
+        )
+        return {
+            "order_id": order["id"],
+            "total_amount": order["total_amount"],
+            "status": order["status"],
+            "created_at": order["created_at"],
+            "user_name": (self._rows("users").get(order["user_id"]) or {}).get("name"),
+            "stall_name": (self._rows("food_stalls").get(order["stall_id"]) or {}).get("name"),
+        }
+
+
+class MemoryClient:
+    """The subset of `supabase.Client` used by this API."""
+
+    def __init__(self, db):
+        self.db = db
+        self.auth = db.auth
+
+    def table(self, name):
+        return MemoryQuery(self.db, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        return MemoryRPC(self.db, name, params)
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_memory_database():
+    """The process-wide in-memory database, created and seeded on first use.
+
+    `SUPABASE_MEMORY_SEED` is "demo" for the sample menu of DB_SCHEMA.md, a
+    path to a JSON file of `{table: [rows]}`, or empty for no data.
+    """
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                db = MemoryDatabase(Config.MEMORY_LATENCY_MS, Config.MEMORY_JITTER_MS)
+                seed = Config.SUPABASE_MEMORY_SEED
+                if seed == "demo":
+                    db.seed(DEMO_SEED)
+                elif seed:
+                    with open(seed) as f:
+                        db.seed(json.load(f))
+                _database = db
+    return _database
@@ -0,0 +1,273 @@
+"""
+Bulk Menu Changes
+=================
+Create, update and delete many menu items per request.
+
+Onboarding a stall or closing one for the day used to take a request, and
+a pre-existence query, per item.  The bulk helpers here take a list of rows
+(a JSON array or a CSV upload) and
+
+1. validate every row up front,
+2. check all referenced stalls or items with one `in_()` lookup, and
+3. write the valid rows in batches: one insert, one delete, or one update
+   per distinct set of changes (closing time sets `is_available = false`
+   on every item, which is a single query).
+
+Each returns a per-row report, so one bad row does not sink the others:
+`{"row": <index>, "status": "created" | "updated" | "deleted" | "error", ...}`.
+"""
+
+import csv
+import io
+
+from postgrest.exceptions import APIError
+
+from api.services.enrichment import fetch_by_ids
+
+CATEGORIES = ("main", "snack", "beverage", "dessert")
+NEW_ITEM_FIELDS = (
+    "stall_id",
+    "name",
+    "description",
+    "price",
+    "image_url",
+    "category",
+    "is_available",
+    "stock",
+)
+REQUIRED_FIELDS = ("stall_id", "name", "price", "category")
+UPDATE_FIELDS = ("name", "price", "is_available", "image_url", "stock")
+
+
+# ── parsing ──────────────────────────────────────
+
+
+def _csv_value(field, raw):
+    raw = raw.strip()
+    if raw == "":
+        return None
+    if field in ("id", "stall_id", "stock"):
+        try:
+            return int(raw)
+        except ValueError:
+            return raw
+    if field == "price":
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    if field == "is_available":
+        lowered = raw.lower()
+        if lowered in ("true", "1", "yes", "y"):
+            return True
+        if lowered in ("false", "0", "no", "n"):
+            return False
+    return raw
+
+
+def parse_rows(request, key="items"):
+    """Rows from a JSON array, `{key: [...]}` or a CSV body with a header line.
+
+    Empty CSV cells are omitted from the row.  Raises ValueError if the body
+    has neither form.
+    """
+    if request.mimetype == "text/csv":
+        reader = csv.DictReader(io.StringIO(request.get_data(as_text=True)))
+        return [
+            {f: _csv_value(f, v) for f, v in row.items() if f and v is not None and v.strip()}
+            for row in reader
+        ]
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get(key)
+    if not isinstance(body, list):
+        raise ValueError(f"Body must be a JSON array, {{\"{key}\": [...]}} or text/csv")
+    return body
+
+
+# ── validation ───────────────────────────────────
+
+
+def valid_stock(value):
+    # None clears the count (unlimited); bool is an int subclass, so exclude it
+    return value is None or (isinstance(value, int) and not isinstance(value, bool) and value >= 0)
+
+
+def _valid_price(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+
+
+def _type_error(row):
+    if "name" in row and (not isinstance(row["name"], str) or not row["name"].strip()):
+        return "name must be a non-empty string"
+    if "is_available" in row and not isinstance(row["is_available"], bool):
+        return "is_available must be true or false"
+    for field in ("description", "image_url"):
+        if field in row and not isinstance(row[field], (str, type(None))):
+            return f"{field} must be a string"
+    if "price" in row and not _valid_price(row["price"]):
+        return "price must be a non-negative number"
+    if not valid_stock(row.get("stock")):
+        return "stock must be a non-negative integer or null"
+    return None
+
+
+def validate_new_item(row):
+    """Error message for a menu item to insert, or None if it is valid."""
+    if not isinstance(row, dict):
+        return "Row must be an object"
+    for field in REQUIRED_FIELDS:
+        if row.get(field) is None:
+            return f"{field} is required"
+    if not isinstance(row["stall_id"], int) or isinstance(row["stall_id"], bool):
+        return "stall_id must be an integer"
+    if row["category"] not in CATEGORIES:
+        return "Invalid category"
+    return _type_error(row)
+
+
+def validate_update(row):
+    """Error message for the changes in `row`, or None if they are valid."""
+    if not any(k in row for k in UPDATE_FIELDS):
+        return "No valid fields provided"
+    return _type_error(row)
+
+
+def _error(index, message):
+    return {"row": index, "status": "error", "error": message}
+
+
+def _summary(results):
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return summary
+
+
+def _report(results):
+    results.sort(key=lambda r: r["row"])
+    return {"results": results, "summary": _summary(results)}
+
+
+# ── bulk operations ──────────────────────────────
+
+
+def bulk_create(client, rows):
+    """Insert the valid rows in one batch.
+
+    Returns `(report, created_rows)`.
+    """
+    results, pending = [], []
+    for index, row in enumerate(rows):
+        error = validate_new_item(row)
+        if error:
+            results.append(_error(index, error))
+        else:
+            pending.append((index, {k: v for k, v in row.items() if k in NEW_ITEM_FIELDS}))
+
+    stalls = fetch_by_ids(client, "food_stalls", "name", [r["stall_id"] for _, r in pending])
+    to_insert = []
+    for index, row in pending:
+        if row["stall_id"] in stalls:
+            to_insert.append((index, row))
+        else:
+            results.append(_error(index, "Stall not found"))
+
+    created = []
+    if to_insert:
+        try:
+            # omitted columns take their database defaults (e.g. is_available)
+            res = (
+                client.table("menu_items")
+                .insert([row for _, row in to_insert], default_to_null=False)
+                .execute()
+            )
+            created = res.data or []
+        except APIError as exc:
+            results.extend(_error(index, exc.message) for index, _ in to_insert)
+        else:
+            for (index, _), item in zip(to_insert, created):
+                results.append({"row": index, "status": "created", "id": item["id"]})
+    return _report(results), created
+
+
+def bulk_update(client, rows):
+    """Apply per-row changes, one update per distinct set of changes.
+
+    Each row carries `id` plus the fields to change.  Returns
+    `(report, updated_rows)`.
+    """
+    results, pending, seen = [], [], set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict) or not isinstance(row.get("id"), int):
+            results.append(_error(index, "id is required"))
+            continue
+        if row["id"] in seen:
+            results.append(_error(index, "Duplicate id"))
+            continue
+        seen.add(row["id"])
+        error = validate_update(row)
+        if error:
+            results.append(_error(index, error))
+        else:
+            pending.append((index, row))
+
+    existing = fetch_by_ids(client, "menu_items", "stall_id", [r["id"] for _, r in pending])
+    groups = {}
+    for index, row in pending:
+        if row["id"] not in existing:
+            results.append(_error(index, "Item not found"))
+            continue
+        changes = tuple(sorted((k, v) for k, v in row.items() if k in UPDATE_FIELDS))
+        groups.setdefault(changes, []).append((index, row["id"]))
+
+    updated = []
+    for changes, members in groups.items():
+        try:
+            res = (
+                client.table("menu_items")
+                .update(dict(changes))
+                .in_("id", [item_id for _, item_id in members])
+                .execute()
+            )
+        except APIError as exc:
+            results.extend(_error(index, exc.message) for index, _ in members)
+            continue
+        updated.extend(res.data or [])
+        results.extend(
+            {"row": index, "status": "updated", "id": item_id} for index, item_id in members
+        )
+    return _report(results), updated
+
+
+def bulk_delete(client, ids):
+    """Delete the items in `ids` with one query.
+
+    Returns `(report, deleted_rows)`; deleted rows carry `id` and `stall_id`.
+    """
+    results, pending = [], []
+    for index, item_id in enumerate(ids):
+        if not isinstance(item_id, int) or isinstance(item_id, bool):
+            results.append(_error(index, "id must be an integer"))
+        else:
+            pending.append((index, item_id))
+
+    existing = fetch_by_ids(client, "menu_items", "stall_id", [i for _, i in pending])
+    found = [(index, item_id) for index, item_id in pending if item_id in existing]
+    results.extend(
+        _error(index, "Item not found") for index, item_id in pending if item_id not in existing
+    )
+
+    deleted = []
+    if found:
+        found_ids = list(dict.fromkeys(item_id for _, item_id in found))
+        try:
+            client.table("menu_items").delete().in_("id", found_ids).execute()
+        except APIError as exc:
+            results.extend(_error(index, exc.message) for index, _ in found)
+        else:
+            deleted = [{"id": i, "stall_id": existing[i]["stall_id"]} for i in found_ids]
+            results.extend(
+                {"row": index, "status": "deleted", "id": item_id} for index, item_id in found
+            )
+    return _report(results), deleted
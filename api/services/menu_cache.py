@@ -0,0 +1,44 @@
+"""
+Menu Cache
+==========
+Caches the public menu reads (stalls, stall items, single items).
+
+The menu changes a few times a day while browsing makes up most of the
+traffic, so reads are served from a per-process `TTLCache`.  Admin menu
+mutations call `invalidate_menu` to drop the affected entries right away;
+the TTL bounds how long other workers may keep serving the old menu.
+
+The menu routes store each response pre-serialized together with a hash of
+its body, which doubles as the ETag.  Dropping an entry therefore also moves
+clients to a new ETag once the payload is rebuilt, and the tag is the same
+in every worker that holds the same menu.
+"""
+
+from api.config import Config
+from api.services.cache import TTLCache
+
+menu_cache = TTLCache(
+    maxsize=Config.MENU_CACHE_SIZE, ttl=Config.MENU_CACHE_TTL, name="menu"
+)
+
+STALLS_KEY = "stalls"
+
+
+def stall_items_key(stall_id, category=None):
+    return f"stall:{stall_id}:items:{category or '*'}"
+
+
+def item_key(item_id):
+    return f"item:{item_id}"
+
+
+def invalidate_menu(stall_ids=(), item_ids=()):
+    """Drop cached entries for the given stalls and items.
+
+    Every category variant of a stall's item list is dropped, since a
+    changed item may move between categories or availability states.
+    """
+    for stall_id in stall_ids:
+        menu_cache.delete_prefix(f"stall:{stall_id}:")
+    for item_id in item_ids:
+        menu_cache.delete(item_key(item_id))
@@ -0,0 +1,291 @@
+"""
+Menu Search
+===========
+In-memory full-text index over the menu, replacing `ILIKE` scans.
+
+Every menu item is indexed by the words of its name, description, category
+and stall name.  A query is split into words, and each word may match an
+indexed word
+
+- exactly,
+- as a prefix ("dos" finds "dosa", for search-as-you-type), or
+- with a typo: up to one edit (two for words of eight letters or more),
+  found through a trigram index of the vocabulary so only similar words
+  are compared.
+
+An item must match every query word.  Matches score by field (a hit in the
+name counts more than one in the description) and by kind (exact beats
+prefix beats typo); ties go to the shorter name.
+
+Queries never touch the database.  The index is loaded once per worker,
+kept current by the admin menu routes (`upsert_item` / `remove_item`) and
+rebuilt in the background every `SEARCH_REFRESH_TTL` seconds to pick up
+changes made through other workers.  Changes applied while a rebuild is
+fetching rows are replayed on top of the rebuilt index, since the fetched
+rows may predate them.
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+from api.config import Config
+from api.services.supabase_service import supabase_service
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "stall_name": 1.5, "description": 1.0}
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lower-case, accent-free words of `text`."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return _WORD.findall(text.lower())
+
+
+def trigrams(word):
+    padded = f"^{word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(word):
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or `limit + 1` once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class MenuSearchIndex:
+    def __init__(self, refresh_ttl=300.0):
+        self.refresh_ttl = refresh_ttl
+        self._items = {}  # item id -> item row (with stall_name)
+        self._postings = {}  # word -> {item id: field weight}
+        self._vocab = []  # sorted words, for prefix lookups
+        self._grams = {}  # trigram -> set of words
+        self._stall_names = {}
+        self._loaded_at = None
+        self._refreshing = False
+        self._changes = None  # upserts and removals made during a refresh fetch
+        self._lock = threading.RLock()
+        self.queries = 0
+
+    # ── building ─────────────────────────────────
+
+    def _fields(self, item):
+        return {
+            "name": item.get("name"),
+            "description": item.get("description"),
+            "category": item.get("category"),
+            "stall_name": item.get("stall_name"),
+        }
+
+    def _add_word(self, word, item_id, weight):
+        postings = self._postings.get(word)
+        if postings is None:
+            postings = self._postings[word] = {}
+            bisect.insort(self._vocab, word)
+            for gram in trigrams(word):
+                self._grams.setdefault(gram, set()).add(word)
+        postings[item_id] = max(postings.get(item_id, 0.0), weight)
+
+    def _drop_word(self, word, item_id):
+        postings = self._postings.get(word)
+        if postings is None:
+            return
+        postings.pop(item_id, None)
+        if not postings:
+            del self._postings[word]
+            del self._vocab[bisect.bisect_left(self._vocab, word)]
+            for gram in trigrams(word):
+                words = self._grams.get(gram)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self._grams[gram]
+
+    def _index(self, item):
+        self._items[item["id"]] = item
+        for field, text in self._fields(item).items():
+            for word in tokenize(text):
+                self._add_word(word, item["id"], FIELD_WEIGHTS[field])
+
+    def _unindex(self, item_id):
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return
+        for text in self._fields(item).values():
+            for word in tokenize(text):
+                self._drop_word(word, item_id)
+
+    def load(self, items, stall_names):
+        """Rebuild the index from menu item rows and a stall id -> name map."""
+        with self._lock:
+            self._items, self._postings, self._vocab, self._grams = {}, {}, [], {}
+            self._stall_names = dict(stall_names)
+            for item in items:
+                self._index(self._with_stall(item))
+            self._loaded_at = time.monotonic()
+
+    def _with_stall(self, row):
+        item = {k: v for k, v in row.items() if k != "food_stalls"}
+        item["stall_name"] = self._stall_names.get(row.get("stall_id"))
+        return item
+
+    def _upsert(self, row):
+        previous = self._items.get(row["id"], {})
+        self._unindex(row["id"])
+        self._index(self._with_stall({**previous, **row}))
+
+    def upsert_item(self, row):
+        """Index a new or changed menu_items row."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._upsert(row)
+            if self._changes is not None:
+                self._changes.append((self._upsert, row))
+
+    def remove_item(self, item_id):
+        with self._lock:
+            self._unindex(item_id)
+            if self._changes is not None:
+                self._changes.append((self._unindex, item_id))
+
+    def _fetch(self):
+        client = supabase_service.get_client()
+        items = client.table("menu_items").select("*").execute().data or []
+        stalls = client.table("food_stalls").select("id,name").execute().data or []
+        return items, {s["id"]: s["name"] for s in stalls}
+
+    def _refresh(self):
+        try:
+            with self._lock:
+                self._changes = []
+            items, stall_names = self._fetch()
+            with self._lock:
+                self.load(items, stall_names)
+                for apply, arg in self._changes:
+                    apply(arg)
+        except Exception:
+            logger.exception("Menu search refresh failed")
+        finally:
+            with self._lock:
+                self._changes = None
+            self._refreshing = False
+
+    def ensure_loaded(self):
+        """Load the index on first use; refresh it in the background when stale."""
+        if self._loaded_at is None:
+            with self._lock:
+                if self._loaded_at is None:
+                    self.load(*self._fetch())
+            return
+        if time.monotonic() - self._loaded_at < self.refresh_ttl or self._refreshing:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="menu-search-refresh", daemon=True).start()
+
+    # ── querying ─────────────────────────────────
+
+    def _matches(self, word):
+        """{item id: score} for one query word."""
+        scores = {}
+
+        def add(candidate, kind):
+            for item_id, weight in self._postings[candidate].items():
+                score = weight * kind
+                if score > scores.get(item_id, 0.0):
+                    scores[item_id] = score
+
+        if word in self._postings:
+            add(word, EXACT)
+        vocab = self._vocab
+        i = bisect.bisect_left(vocab, word)
+        while i < len(vocab) and vocab[i].startswith(word):
+            if vocab[i] != word:
+                add(vocab[i], PREFIX)
+            i += 1
+
+        limit = max_typos(word)
+        if limit:
+            seen = set()
+            for gram in trigrams(word):
+                seen.update(self._grams.get(gram, ()))
+            for candidate in seen:
+                if candidate == word or candidate.startswith(word):
+                    continue
+                # compare with the same-length head too, so "dosq" finds "dosai"
+                head = candidate[: len(word)]
+                if min(
+                    edit_distance(word, candidate, limit),
+                    edit_distance(word, head, limit) if len(head) < len(candidate) else limit + 1,
+                ) <= limit:
+                    add(candidate, FUZZY)
+        return scores
+
+    def search(self, query, limit=20, include_unavailable=False):
+        """Ranked item rows matching every word of `query`."""
+        words = tokenize(query)
+        if not words:
+            return []
+        self.ensure_loaded()
+        with self._lock:
+            self.queries += 1
+            totals = None
+            for word in dict.fromkeys(words):
+                scores = self._matches(word)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {i: s + scores[i] for i, s in totals.items() if i in scores}
+                if not totals:
+                    return []
+            ranked = []
+            for item_id, score in totals.items():
+                item = self._items[item_id]
+                if include_unavailable or item.get("is_available", True):
+                    ranked.append((-score, len(item.get("name") or ""), item_id, item))
+        ranked.sort(key=lambda r: r[:3])
+        return [dict(r[3], score=round(-r[0], 3)) for r in ranked[:limit]]
+
+    def stats(self):
+        return {
+            "name": "menu_search",
+            "items": len(self._items),
+            "words": len(self._vocab),
+            "trigrams": len(self._grams),
+            "queries": self.queries,
+            "age": None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 1),
+        }
+
+
+menu_search = MenuSearchIndex(refresh_ttl=Config.SEARCH_REFRESH_TTL)
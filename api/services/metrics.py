@@ -0,0 +1,166 @@
+"""
+Metrics
+=======
+Prometheus-style histograms, served by `GET /metrics` in the text
+exposition format.
+
+Recording sits on hot paths (every request, every Supabase query), so it
+has to stay cheap when many threads record at once.  Each metric keeps
+its values in `STRIPES` independent stripes, each with its own lock, and a
+thread always writes to the stripe it was assigned on first use.  Writers
+therefore rarely contend.  Stripes are assigned round-robin rather than one
+per thread, so memory stays bounded under gevent, where every greenlet
+counts as a thread.  A scrape sums the stripes.
+
+Values that other components already count (cache hits, the Telegram
+queue) are read at scrape time through collectors registered with
+`register_collector`, instead of being counted twice.
+
+Like the caches, metrics are per worker process.  With several gunicorn
+workers, each scrape shows the worker that answered it.
+"""
+
+import bisect
+import itertools
+import threading
+
+STRIPES = 16
+# seconds; tuned for API requests and database round-trips
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_slot = threading.local()
+_next_slot = itertools.count()
+
+
+def _stripe_index():
+    try:
+        return _slot.index
+    except AttributeError:
+        _slot.index = next(_next_slot) % STRIPES
+        return _slot.index
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._stripes = [({}, threading.Lock()) for _ in range(STRIPES)]
+        _registry.append(self)
+
+    def _stripe(self):
+        return self._stripes[_stripe_index()]
+
+    def _merged(self):
+        """Sum the stripes into `{label values: slots}`."""
+        merged = {}
+        for values, lock in self._stripes:
+            with lock:
+                items = [(k, list(v)) for k, v in values.items()]
+            for key, value in items:
+                if key not in merged:
+                    merged[key] = value
+                else:
+                    merged[key] = [a + b for a, b in zip(merged[key], value)]
+        return merged
+
+    def _labels(self, key, extra=()):
+        return tuple(zip(self.labelnames, key)) + tuple(extra)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        # one slot per bucket, one for +Inf, then sum and count
+        index = bisect.bisect_left(self.buckets, value)
+        values, lock = self._stripe()
+        with lock:
+            slots = values.get(labelvalues)
+            if slots is None:
+                slots = values[labelvalues] = [0] * (len(self.buckets) + 3)
+            slots[index] += 1
+            slots[-2] += value
+            slots[-1] += 1
+
+    def render(self):
+        bounds = self.buckets + (float("inf"),)
+        for key, slots in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, slots):
+                cumulative += count
+                labels = self._labels(key, (("le", _format_value(bound)),))
+                yield f"{self.name}_bucket{_format_labels(labels)} {cumulative}"
+            labels = _format_labels(self._labels(key))
+            yield f"{self.name}_sum{labels} {_format_value(slots[-2])}"
+            yield f"{self.name}_count{labels} {slots[-1]}"
+
+
+_registry = []
+_collectors = []
+
+
+def register_collector(collect):
+    """Add a callable returning `[(name, kind, help, [(labels dict, value)])]`.
+
+    It is called on every scrape, for values kept elsewhere.
+    """
+    _collectors.append(collect)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                labels = _format_labels(sorted(labels.items()))
+                lines.append(f"{name}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle an HTTP request",
+    ("method", "endpoint", "status"),
+)
+supabase_query_duration = Histogram(
+    "supabase_query_duration_seconds",
+    "Time of one Supabase query, by table (rpc/<name> for functions)",
+    ("table", "outcome"),
+)
+telegram_send_duration = Histogram(
+    "telegram_send_duration_seconds",
+    "Time of one Telegram sendMessage call",
+    ("outcome",),
+)
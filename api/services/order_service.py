@@ -8,23 +8,139 @@ Routes parse requests and return responses; this module
 handles the database operations and calculations.
 """
 
+import logging
+
+from postgrest.exceptions import APIError
+
+from api.config import Config
 from api.services.supabase_service import supabase_service
-from api.services.telegram import notify_admin_new_order
+from api.services.telegram import get_admin_chat_ids, notify_admins_new_order
+from api.services.enrichment import enrich_orders, fetch_by_ids
+from api.services.pagination import fetch_page, iter_pages
+from api.services.events import publish_order_event
+from api.services.concurrency import run_concurrently
+from api.services.inventory import stock_index
+
+logger = logging.getLogger(__name__)
 
+# SQLSTATE raised by place_order for invalid input (plpgsql RAISE EXCEPTION)
+RPC_VALIDATION_ERROR = "P0001"
+# PostgREST error when the function does not exist in the schema cache
+RPC_NOT_FOUND = "PGRST202"
+
+_rpc_available = True
 
 
 def create_new_order(user_id, stall_id, items):
     """Create and persist a new order.
 
-    See function docstring in conversation for full description.
+    Validates that every item exists, belongs to `stall_id` and is available,
+    prices the order from current menu prices and stores it with its items.
+    Raises ValueError for invalid input.
+
+    With `ORDER_PLACEMENT_MODE = "rpc"` (the default) all of this happens in
+    the `place_order` database function: one round-trip, in one transaction.
+    If that function has not been deployed yet the Python path below is used
+    instead, which takes three round-trips plus one per counted item.
+
+    Counted items are first reserved in the in-process stock index, so an
+    order for more than is left is refused without touching the database.
+    The hold is released if the order cannot be stored.
+    """
+    reservation = stock_index.reserve(items)
+    try:
+        order = _place_order(user_id, stall_id, items)
+    except ValueError:
+        stock_index.release(reservation)
+        if reservation.quantities:
+            # possibly sold by another worker: reload the counts
+            stock_index.invalidate()
+        raise
+    except Exception:
+        stock_index.release(reservation)
+        raise
+    stock_index.commit(reservation)
+
+    names = (order.pop("user_name", None), order.pop("stall_name", None))
+    try:
+        _notify_admins(order, user_id, stall_id, *names)
+    except Exception:
+        # do not fail the request if notification fails
+        logger.exception("Could not notify admins of order %s", order["order_id"])
+    publish_order_event(
+        "order.created",
+        {
+            "id": order["order_id"],
+            "user_id": user_id,
+            "stall_id": stall_id,
+            "total_amount": order["total_amount"],
+            "status": order["status"],
+            "created_at": order.get("created_at"),
+        },
+    )
+
+    return order
+
+
+def _notify_admins(order, user_id, stall_id, user_name, stall_name):
+    """Queue the new-order message for every admin with a telegram_id.
+
+    place_order returns the user and stall names with the order; they are
+    only looked up here for the Python path or an older place_order.
     """
+    if not get_admin_chat_ids():
+        return
+    if user_name is None or stall_name is None:
+        client = supabase_service.get_client()
+        found = run_concurrently(
+            {
+                "users": lambda: fetch_by_ids(client, "users", "name", [user_id]),
+                "stalls": lambda: fetch_by_ids(client, "food_stalls", "name", [stall_id]),
+            }
+        )
+        user_name = (found["users"].get(user_id) or {}).get("name") or user_id
+        stall_name = (found["stalls"].get(stall_id) or {}).get("name") or f"stall {stall_id}"
+    notify_admins_new_order(order["order_id"], user_name, stall_name, order["total_amount"])
+
+
+def _place_order(user_id, stall_id, items):
+    global _rpc_available
     client = supabase_service.get_client()
 
+    if Config.ORDER_PLACEMENT_MODE == "rpc" and _rpc_available:
+        try:
+            return _place_order_rpc(client, user_id, stall_id, items)
+        except APIError as exc:
+            if exc.code == RPC_VALIDATION_ERROR:
+                raise ValueError(exc.message)
+            if exc.code != RPC_NOT_FOUND:
+                raise
+            logger.warning("place_order function missing; using the Python order path")
+            _rpc_available = False
+    return _place_order_python(client, user_id, stall_id, items)
+
+
+def _place_order_rpc(client, user_id, stall_id, items):
+    params = {
+        "p_user_id": user_id,
+        "p_stall_id": stall_id,
+        "p_items": [
+            {"menu_item_id": i["menu_item_id"], "quantity": i.get("quantity", 0)}
+            for i in items
+        ],
+    }
+    res = client.rpc("place_order", params).execute()
+    if not res.data:
+        raise RuntimeError("Failed to create order")
+    return res.data
+
+
+def _place_order_python(client, user_id, stall_id, items):
     # fetch menu items for all ids
     ids = [i["menu_item_id"] for i in items]
     res = (
         client.table("menu_items")
-        .select("id,stall_id,price,is_available")
+        .select("id,stall_id,price,is_available,stock")
         .in_("id", ids)
         .execute()
     )
@@ -50,6 +166,8 @@ def create_new_order(user_id, stall_id, items):
             raise ValueError(f"Item {mid} is not available")
         total_amount += mi.get("price", 0) * qty
 
+    taken = _take_stock(client, item_map, items)
+
     # insert order
     order_payload = {
         "user_id": user_id,
@@ -57,9 +175,13 @@ def create_new_order(user_id, stall_id, items):
         "total_amount": total_amount,
         "status": "pending",
     }
-    insert_res = client.table("orders").insert(order_payload).execute()
-    if not insert_res.data:
-        raise RuntimeError("Failed to create order")
+    try:
+        insert_res = client.table("orders").insert(order_payload).execute()
+        if not insert_res.data:
+            raise RuntimeError("Failed to create order")
+    except Exception:
+        _return_stock(client, taken)
+        raise
     order_rec = insert_res.data[0]
     order_id = order_rec.get("id")
 
@@ -77,14 +199,13 @@ def create_new_order(user_id, stall_id, items):
                 "price_at_order": mi.get("price", 0),
             }
         )
-    client.table("order_items").insert(order_items_payload).execute()
-
-    # notify admins
     try:
-        notify_admin_new_order(order_id, user_id, stall_id, total_amount)
+        client.table("order_items").insert(order_items_payload).execute()
     except Exception:
-        # do not fail the request if notification fails
-        pass
+        # not transactional: remove the order so no item-less order is left
+        client.table("orders").delete().eq("id", order_id).execute()
+        _return_stock(client, taken)
+        raise
 
     return {
         "order_id": order_id,
@@ -94,39 +215,98 @@ def create_new_order(user_id, stall_id, items):
     }
 
 
+def _take_stock(client, item_map, items):
+    """Decrement counted items with compare-and-set updates.
 
-def get_user_orders(user_id, status_filter=None):
-    client = supabase_service.get_client()
+    Returns `(id, new_stock, quantity)` for each decrement so they can be
+    undone with `_return_stock`; on failure the ones already made are undone.
+    """
+    wanted = {}
+    for entry in items:
+        mid = entry["menu_item_id"]
+        wanted[mid] = wanted.get(mid, 0) + entry.get("quantity", 0)
+
+    taken = []
+    try:
+        for mid, qty in wanted.items():
+            left = item_map[mid].get("stock")
+            if left is None:
+                continue
+            if left < qty:
+                raise ValueError(f"Only {left} left of item {mid}")
+            res = (
+                client.table("menu_items")
+                .update({"stock": left - qty})
+                .eq("id", mid)
+                .eq("stock", left)
+                .execute()
+            )
+            if not res.data:
+                raise ValueError(f"Stock of item {mid} just changed, please try again")
+            taken.append((mid, left - qty, qty))
+    except Exception:
+        _return_stock(client, taken)
+        raise
+    return taken
+
+
+def _return_stock(client, taken):
+    for mid, left, qty in taken:
+        try:
+            res = (
+                client.table("menu_items")
+                .update({"stock": left + qty})
+                .eq("id", mid)
+                .eq("stock", left)
+                .execute()
+            )
+            if not res.data:
+                logger.warning("Could not return %s portions of item %s", qty, mid)
+        except Exception:
+            logger.exception("Could not return %s portions of item %s", qty, mid)
+
+
+def _user_orders_query(client, user_id, status_filter=None):
     query = client.table("orders").select("*").eq("user_id", user_id)
     if status_filter:
         query = query.eq("status", status_filter)
-    query = query.order("created_at", desc=True)
-    res = query.execute()
-    orders = res.data or []
-
-    # enrich each order
-    for order in orders:
-        oid = order.get("id")
-        items_res = (
-            client.table("order_items")
-            .select("*,menu_items(name,image_url)")
-            .eq("order_id", oid)
-            .execute()
-        )
-        order_items = items_res.data or []
-        order["items"] = order_items
+    return query
 
-        # fetch stall name
-        stall_res = (
-            client.table("food_stalls")
-            .select("name")
-            .eq("id", order.get("stall_id"))
-            .single()
-            .execute()
-        )
-        order["stall"] = stall_res.data
 
-    return orders
+def _enrich_user_orders(client, orders):
+    # attach items and stall name for the whole page in two queries
+    return enrich_orders(
+        client,
+        orders,
+        user_fields=None,
+        item_fields="*,menu_items(name,image_url)",
+    )
+
+
+def get_user_orders(user_id, status_filter=None, cursor=None, limit=None):
+    """Return one page of a user's orders, newest first.
+
+    The result is `{"orders": [...], "next_cursor": ...}`; pass
+    `next_cursor` back as `cursor` to read the following page.
+    """
+    client = supabase_service.get_client()
+    orders, next_cursor = fetch_page(
+        _user_orders_query(client, user_id, status_filter),
+        cursor,
+        limit or Config.ORDERS_PAGE_SIZE,
+    )
+    return {"orders": _enrich_user_orders(client, orders), "next_cursor": next_cursor}
+
+
+def iter_user_orders(user_id, status_filter=None):
+    """Yield every order of a user page by page, for streamed exports."""
+    client = supabase_service.get_client()
+    pages = iter_pages(
+        lambda: _user_orders_query(client, user_id, status_filter),
+        Config.ORDERS_EXPORT_PAGE_SIZE,
+    )
+    for page in pages:
+        yield from _enrich_user_orders(client, page)
 
 
 def get_order_detail(order_id, user_id):
@@ -143,21 +323,21 @@ def get_order_detail(order_id, user_id):
     if not order:
         return None
 
-    items_res = (
-        client.table("order_items")
-        .select("*,menu_items(name,image_url)")
-        .eq("order_id", order_id)
-        .execute()
-    )
-    order["items"] = items_res.data or []
-
-    stall_res = (
-        client.table("food_stalls")
-        .select("*")
-        .eq("id", order.get("stall_id"))
-        .single()
-        .execute()
+    # items and stall only depend on the order row: fetch them concurrently
+    found = run_concurrently(
+        {
+            "items": lambda: client.table("order_items")
+            .select("*,menu_items(name,image_url)")
+            .eq("order_id", order_id)
+            .execute(),
+            "stall": lambda: client.table("food_stalls")
+            .select("*")
+            .eq("id", order.get("stall_id"))
+            .single()
+            .execute(),
+        }
     )
-    order["stall"] = stall_res.data
+    order["items"] = found["items"].data or []
+    order["stall"] = found["stall"].data
 
     return order
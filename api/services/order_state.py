@@ -0,0 +1,144 @@
+"""
+Order State Machine
+===================
+The allowed order status changes, applied as compare-and-set updates.
+
+An order moves pending -> approved -> ready -> completed, or
+pending -> rejected.  Each move is a single conditional update,
+`UPDATE orders SET status = <to> WHERE id = ... AND status = <from>
+RETURNING *`, so checking and changing the status is one round-trip, and
+when two admins act on the same order at once exactly one of them wins.
+The other gets a `TransitionConflict` carrying the order's current status.
+
+The same update also covers many orders at once (`transition_many`), and
+`announce` sends the matching Telegram notifications and live events for
+whatever moved.
+"""
+
+from api.services.concurrency import run_concurrently
+from api.services.enrichment import fetch_by_ids
+from api.services.events import publish_order_event
+from api.services.telegram import (
+    notify_order_approved,
+    notify_order_rejected,
+    notify_order_ready,
+)
+
+
+class Transition:
+    def __init__(self, action, source, target, fields=()):
+        self.action = action
+        self.source = source
+        self.target = target
+        self.fields = fields  # extra columns the action may set
+
+
+TRANSITIONS = {
+    t.action: t
+    for t in (
+        Transition("approve", "pending", "approved", fields=("estimated_time",)),
+        Transition("reject", "pending", "rejected", fields=("rejection_reason",)),
+        Transition("ready", "approved", "ready"),
+        Transition("complete", "ready", "completed"),
+    )
+}
+
+
+class TransitionConflict(Exception):
+    """The order is missing (`status` None) or not in the required state."""
+
+    def __init__(self, order_id, transition, status):
+        self.order_id = order_id
+        self.transition = transition
+        self.status = status
+        if status is None:
+            message = "Order not found"
+        else:
+            message = f"Order is not in {transition.source} state"
+        super().__init__(message)
+
+
+def _changes(transition, changes):
+    update = {"status": transition.target}
+    for field in transition.fields:
+        if changes and changes.get(field) is not None:
+            update[field] = changes[field]
+    return update
+
+
+def _current_status(client, order_ids):
+    """Current status of each order; missing orders are left out."""
+    rows = fetch_by_ids(client, "orders", "status", order_ids)
+    return {order_id: row["status"] for order_id, row in rows.items()}
+
+
+def transition(client, order_id, action, changes=None):
+    """Move one order; returns the updated row or raises TransitionConflict.
+
+    Only a failed move costs a second query, to report why it failed.
+    """
+    t = TRANSITIONS[action]
+    res = (
+        client.table("orders")
+        .update(_changes(t, changes))
+        .eq("id", order_id)
+        .eq("status", t.source)
+        .execute()
+    )
+    if res.data:
+        return res.data[0]
+    status = _current_status(client, [order_id]).get(order_id)
+    raise TransitionConflict(order_id, t, status)
+
+
+def transition_many(client, order_ids, action, changes=None):
+    """Move many orders in one statement.
+
+    Returns `(moved, conflicts)`: the updated rows keyed by id, and the
+    current status (None if missing) of every order that did not move.
+    """
+    t = TRANSITIONS[action]
+    order_ids = list(dict.fromkeys(order_ids))
+    res = (
+        client.table("orders")
+        .update(_changes(t, changes))
+        .in_("id", order_ids)
+        .eq("status", t.source)
+        .execute()
+    )
+    moved = {order["id"]: order for order in (res.data or [])}
+    missed = [i for i in order_ids if i not in moved]
+    current = _current_status(client, missed) if missed else {}
+    return moved, {order_id: current.get(order_id) for order_id in missed}
+
+
+def announce(client, action, orders):
+    """Notify students on Telegram and publish status events for moved orders.
+
+    Telegram ids, and stall names for `ready`, are fetched in one lookup
+    each for all `orders`; messages go on the dispatcher queue.
+    """
+    if not orders:
+        return
+    if action != "complete":
+        lookups = {
+            "users": lambda: fetch_by_ids(
+                client, "users", "telegram_id", [o.get("user_id") for o in orders]
+            ),
+        }
+        if action == "ready":
+            lookups["stalls"] = lambda: fetch_by_ids(
+                client, "food_stalls", "name", [o.get("stall_id") for o in orders]
+            )
+        found = run_concurrently(lookups)
+        for order in orders:
+            tid = found["users"].get(order.get("user_id"), {}).get("telegram_id")
+            if action == "approve":
+                notify_order_approved(tid, order["id"], order.get("estimated_time"))
+            elif action == "reject":
+                notify_order_rejected(tid, order["id"], order.get("rejection_reason", ""))
+            else:
+                stall = found["stalls"].get(order.get("stall_id"), {})
+                notify_order_ready(tid, order["id"], stall.get("name"))
+    for order in orders:
+        publish_order_event("order.status", order)
@@ -0,0 +1,99 @@
+"""
+Keyset Pagination
+=================
+Cursor pagination over `(created_at, id)` for order listings.
+
+Offsets get slower the deeper a client pages and skip or repeat rows when
+new orders arrive.  A keyset cursor instead remembers the last row that was
+returned and asks for rows strictly "after" it in the listing order
+(newest first), which the `created_at` index can answer directly.
+
+Cursors are opaque to clients: url-safe base64 of the last row's
+`created_at` and `id`.
+"""
+
+import base64
+import json
+
+from flask import Response, stream_with_context
+
+
+def encode_cursor(row):
+    """Build the cursor that continues a listing after `row`."""
+    raw = json.dumps([row.get("created_at"), row.get("id")]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return `(created_at, id)` from a cursor, raising ValueError if invalid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def parse_limit(value, default, maximum):
+    """Parse a `limit` query parameter, clamped to `maximum`."""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
+
+
+def apply_keyset(query, cursor):
+    """Restrict `query` to rows after `cursor` and order it newest first."""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+    return query.order("created_at", desc=True).order("id", desc=True)
+
+
+def fetch_page(query, cursor, limit):
+    """Execute one page of a listing.
+
+    Returns `(rows, next_cursor)`; `next_cursor` is None on the last page.
+    One extra row is requested to find out whether another page exists.
+    """
+    res = apply_keyset(query, cursor).limit(limit + 1).execute()
+    rows = res.data or []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def iter_pages(build_query, page_size):
+    """Yield successive pages of a listing until it is exhausted.
+
+    `build_query` must return a fresh, filtered query on every call since
+    PostgREST builders are mutated by each filter.
+    """
+    cursor = None
+    while True:
+        rows, cursor = fetch_page(build_query(), cursor, page_size)
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+def ndjson_response(rows):
+    """Stream an iterable of rows as newline-delimited JSON."""
+
+    def generate():
+        for row in rows:
+            yield json.dumps(row, default=str) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
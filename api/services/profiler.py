@@ -0,0 +1,204 @@
+"""
+Request Profiler
+================
+Opt-in profiles of single requests, kept in a small on-disk ring buffer.
+
+A request is profiled when an admin sends `X-Profile: 1`, or when it is
+picked by `PROFILE_SAMPLE_RATE` (0 disables sampling).  A profile holds
+
+- a cProfile run of the request thread, and
+- spans for every Supabase query and Telegram enqueue made for the request,
+  including queries run on the `run_concurrently` pool, which cProfile
+  does not see.  Both are recorded through the `span()` context manager,
+  which costs one context-variable lookup when no profile is active.
+
+Each profile is written to `PROFILE_DIR` as `<id>.json` (summary, spans and
+the top functions) and `<id>.prof` (raw pstats, for snakeviz or
+`python -m pstats`).  Only the newest `PROFILE_MAX_FILES` are kept.
+"""
+
+import cProfile
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from api.config import Config
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("profile", default=None)
+_seq = itertools.count()
+_prune_lock = threading.Lock()
+
+PROFILE_ID = re.compile(r"^[0-9]{13}-[0-9a-f]{4,}$")
+MAX_SPANS = 1000
+
+
+class Profile:
+    """Everything captured for one request."""
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.start = time.perf_counter()
+        self.wall = None
+        self.spans = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+        self._profiler = cProfile.Profile()
+        self._token = None
+
+    def begin(self):
+        self._token = _current.set(self)
+        try:
+            self._profiler.enable()
+        except ValueError:
+            # another profiler is active on this interpreter; keep spans only
+            self._profiler = None
+
+    def finish(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        if self.wall is None:
+            self.wall = time.perf_counter() - self.start
+
+    def add_span(self, kind, name, start, seconds):
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped_spans += 1
+                return
+            self.spans.append(
+                {
+                    "kind": kind,
+                    "name": name,
+                    "start_ms": round((start - self.start) * 1000, 3),
+                    "duration_ms": round(seconds * 1000, 3),
+                    "thread": threading.current_thread().name,
+                }
+            )
+
+    def _functions(self, limit):
+        if self._profiler is None:
+            return []
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, func), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append(
+                {
+                    "function": f"{filename}:{line}({func})",
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 3),
+                    "cumulative_ms": round(cumulative * 1000, 3),
+                }
+            )
+        rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+        return rows[:limit]
+
+    def summary(self, request_info):
+        breakdown = {}
+        for span in self.spans:
+            entry = breakdown.setdefault(span["kind"], {"calls": 0, "ms": 0.0})
+            entry["calls"] += 1
+            entry["ms"] = round(entry["ms"] + span["duration_ms"], 3)
+        return {
+            **request_info,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall * 1000, 3),
+            "breakdown": breakdown,
+            "spans": self.spans,
+            "dropped_spans": self.dropped_spans,
+            "functions": self._functions(Config.PROFILE_TOP_FUNCTIONS),
+        }
+
+    def save(self, request_info):
+        """Write the profile to the ring buffer; returns its id."""
+        profile_id = f"{int(time.time() * 1000)}-{os.getpid():x}{next(_seq):04x}"
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        base = os.path.join(Config.PROFILE_DIR, profile_id)
+        summary = {"id": profile_id, **self.summary(request_info)}
+        with open(base + ".json", "w") as f:
+            json.dump(summary, f)
+        if self._profiler is not None:
+            self._profiler.dump_stats(base + ".prof")
+        _prune()
+        return profile_id
+
+
+@contextmanager
+def span(kind, name):
+    """Time a block into the active profile, if there is one."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(kind, name, start, time.perf_counter() - start)
+
+
+def _ids():
+    try:
+        names = os.listdir(Config.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    ids = {n.rsplit(".", 1)[0] for n in names if n.endswith(".json")}
+    return sorted((i for i in ids if PROFILE_ID.match(i)), reverse=True)
+
+
+def _prune():
+    """Delete all but the newest PROFILE_MAX_FILES profiles."""
+    with _prune_lock:
+        for profile_id in _ids()[Config.PROFILE_MAX_FILES:]:
+            for suffix in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(Config.PROFILE_DIR, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+def list_profiles():
+    """Summaries of the stored profiles, newest first, without spans."""
+    profiles = []
+    for profile_id in _ids():
+        summary = load_profile(profile_id)
+        if summary is None:
+            continue
+        profiles.append(
+            {k: v for k, v in summary.items() if k not in ("spans", "functions")}
+        )
+    return profiles
+
+
+def load_profile(profile_id):
+    """The stored summary for `profile_id`, or None."""
+    path = profile_path(profile_id, "json")
+    if path is None:
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def profile_path(profile_id, kind):
+    """Path of a profile's `json` or `prof` file, or None if there is none."""
+    if not PROFILE_ID.match(profile_id or ""):
+        return None
+    path = os.path.join(Config.PROFILE_DIR, f"{profile_id}.{kind}")
+    return path if os.path.isfile(path) else None
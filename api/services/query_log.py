@@ -0,0 +1,212 @@
+"""
+Query Accounting
+================
+Counts and times every Supabase query made while serving a request.
+
+`TracedClient` wraps the Supabase client (or the memory backend's).  Each
+builder chain it hands out is recorded on `.execute()` into the current
+`QueryLog`, with
+
+- its table (or `rpc/<function>`),
+- its shape: the table plus the builder methods called, such as
+  `users:select.eq.single`, and
+- the time taken.
+
+The log lives in a context variable, so queries issued through
+`run_concurrently` are still charged to the request that issued them.
+
+A loop that makes one query per row shows up as one shape repeated, and the
+repeats grow with the size of the result.  `QueryLog.repeated()` reports
+shapes run `N_PLUS_ONE_THRESHOLD` or more times, which the request hooks in
+`api/middleware/query_log.py` log as a likely N+1.
+
+Every query is also timed into the `supabase_query_duration_seconds`
+metric, inside a request or not, and into the active profile as a span.
+
+`query_budget(n)` asserts that a block makes at most `n` queries, e.g. a
+test-client call to an endpoint.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from api.config import Config
+from api.services.metrics import supabase_query_duration
+from api.services.profiler import span
+
+_current = ContextVar("query_log", default=None)
+
+
+class QueryLog:
+    """Queries made within one request (or `query_budget` block)."""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.queries = []  # (table, shape, seconds)
+        self._lock = threading.Lock()
+
+    def record(self, table, shape, seconds):
+        with self._lock:
+            self.queries.append((table, shape, seconds))
+        if self.parent is not None:
+            self.parent.record(table, shape, seconds)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(q[2] for q in self.queries)
+
+    def by_shape(self):
+        counts = {}
+        for _, shape, _ in self.queries:
+            counts[shape] = counts.get(shape, 0) + 1
+        return counts
+
+    def repeated(self, threshold=None):
+        """Shapes run at least `threshold` times: `{shape: count}`."""
+        if threshold is None:
+            threshold = Config.N_PLUS_ONE_THRESHOLD
+        return {s: n for s, n in self.by_shape().items() if n >= threshold}
+
+
+def current_log():
+    return _current.get()
+
+
+def start_log():
+    """Open a log nested in the current one; returns `(log, token)`."""
+    log = QueryLog(parent=_current.get())
+    return log, _current.set(log)
+
+
+def end_log(token):
+    _current.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail with AssertionError if the block makes more than `max_queries` queries.
+
+    Yields the `QueryLog`, so the caller can also inspect what ran.
+    """
+    log, token = start_log()
+    try:
+        yield log
+    finally:
+        end_log(token)
+    if log.count > max_queries:
+        shapes = ", ".join(f"{s} x{n}" for s, n in sorted(log.by_shape().items()))
+        raise AssertionError(f"{log.count} queries, budget is {max_queries}: {shapes}")
+
+
+class _TracedBuilder:
+    """Proxy for a query builder chain that records its `execute()`."""
+
+    __slots__ = ("_target", "_table", "_steps")
+
+    def __init__(self, target, table, steps):
+        self._target = target
+        self._table = table
+        self._steps = steps
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "execute":
+            return self._execute
+        steps = self._steps + (name,)
+        if not callable(attr):
+            # properties such as `not_` return the builder itself
+            return _TracedBuilder(attr, self._table, steps) if hasattr(attr, "execute") else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _TracedBuilder(result, self._table, steps)
+            return result
+
+        return call
+
+    def _execute(self, *args, **kwargs):
+        shape = f"{self._table}:{'.'.join(self._steps)}"
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with span("supabase", shape):
+                result = self._target.execute(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            supabase_query_duration.observe(elapsed, self._table, outcome)
+            log = _current.get()
+            if log is not None:
+                log.record(self._table, shape, elapsed)
+
+
+class TracedClient:
+    """Client wrapper whose table and rpc builders are recorded per request."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _TracedBuilder(self._client.table(name), name, ())
+
+    from_ = table
+
+    def rpc(self, name, params=None, *args, **kwargs):
+        return _TracedBuilder(self._client.rpc(name, params, *args, **kwargs), f"rpc/{name}", ())
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class EndpointStats:
+    """Query counts per endpoint, across requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def add(self, endpoint, log, repeated):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    "requests": 0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "db_seconds": 0.0,
+                    "n_plus_one": 0,
+                    "last_n_plus_one": None,
+                }
+            entry["requests"] += 1
+            entry["queries"] += log.count
+            entry["max_queries"] = max(entry["max_queries"], log.count)
+            entry["db_seconds"] += log.seconds
+            if repeated:
+                entry["n_plus_one"] += 1
+                entry["last_n_plus_one"] = repeated
+
+    def stats(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    **entry,
+                    "avg_queries": round(entry["queries"] / entry["requests"], 2),
+                    "db_seconds": round(entry["db_seconds"], 4),
+                }
+                for endpoint, entry in sorted(self._endpoints.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+endpoint_stats = EndpointStats()
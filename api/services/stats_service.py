@@ -0,0 +1,102 @@
+"""
+Stats Service
+=============
+Reads the dashboard numbers from pre-aggregated rollup tables.
+
+Database triggers keep per-day/per-stall order and revenue totals, per-item
+quantities and per-status order counts up to date as orders are inserted and
+change status (see "Stats Rollups" in docs/DB_SCHEMA.md).  The dashboard
+therefore reads a handful of small rows instead of scanning `orders` and
+`order_items`, and its cost no longer grows with the order history.  Date
+ranges are summed in the database by the `stats_range` function rather than
+fetched day by day, so a long range costs the same as a short one.
+
+Revenue follows the old dashboard definition: the total of orders in the
+approved, ready or completed state, attributed to the day the order was
+placed.
+"""
+
+from datetime import date
+
+from api.services.supabase_service import supabase_service
+
+TOP_ITEMS = 5
+
+
+def _range_totals(client, start, end, stall_id):
+    """Totals, per-stall figures and top items for a date range.
+
+    Summed in the database by the `stats_range` function, so the response
+    is one small JSON object however long the range is.
+    """
+    params = {"p_from": start, "p_to": end, "p_stall_id": stall_id, "p_top": TOP_ITEMS}
+    return client.rpc("stats_range", params).execute().data or {}
+
+
+def _all_time_popular_items(client, stall_id):
+    # all-time totals are kept in their own table: a top-N read
+    query = client.table("stats_item_totals").select("menu_item_id,quantity,menu_items(name)")
+    if stall_id is not None:
+        query = query.eq("stall_id", stall_id)
+    rows = query.order("quantity", desc=True).limit(TOP_ITEMS).execute().data or []
+    return [
+        {"name": (r.get("menu_items") or {}).get("name"), "count": r.get("quantity", 0)}
+        for r in rows
+    ]
+
+
+def get_dashboard_stats(start=None, end=None, stall_id=None, by_stall=False):
+    """Order, revenue and popularity figures for the admin dashboard.
+
+    `start`/`end` are inclusive ISO dates.  Without them the figures cover
+    today and popular items are ranked over all time, as before.  `by_stall`
+    adds a per-stall breakdown of orders and revenue.
+    """
+    client = supabase_service.get_client()
+    today = date.today().isoformat()
+    all_time = start is None and end is None
+    start = start or today
+    end = end or today
+
+    # today's figures: at most one row per stall
+    today_query = (
+        client.table("stats_daily_stall").select("order_count,revenue").eq("day", today)
+    )
+    if stall_id is not None:
+        today_query = today_query.eq("stall_id", stall_id)
+    daily = today_query.execute().data or []
+
+    status_query = client.table("stats_status_counts").select("order_count").eq("status", "pending")
+    if stall_id is not None:
+        status_query = status_query.eq("stall_id", stall_id)
+    pending = sum(r.get("order_count", 0) for r in (status_query.execute().data or []))
+
+    stats = {
+        "today_orders": sum(r["order_count"] for r in daily),
+        "pending_orders": pending,
+        "today_revenue": sum(float(r["revenue"]) for r in daily),
+    }
+
+    if all_time:
+        stats["popular_items"] = _all_time_popular_items(client, stall_id)
+    if all_time and not by_stall:
+        return stats
+
+    totals = _range_totals(client, start, end, stall_id)
+    if not all_time:
+        stats["popular_items"] = [
+            {"name": p.get("name"), "count": p.get("count", 0)}
+            for p in totals.get("popular_items") or []
+        ]
+    stats["range"] = {
+        "from": start,
+        "to": end,
+        "orders": totals.get("orders", 0),
+        "revenue": float(totals.get("revenue") or 0),
+    }
+    if by_stall:
+        stats["range"]["by_stall"] = [
+            {"stall_id": r["stall_id"], "orders": r["orders"], "revenue": float(r["revenue"])}
+            for r in totals.get("by_stall") or []
+        ]
+    return stats
@@ -1,24 +1,140 @@
-from supabase import create_client
+"""
+Supabase Service
+================
+Owns the Supabase clients shared by all request threads.
+
+Two clients are kept:
+
+- the service-role client (`get_client`) used for all table access, and
+- an anon-key client (`get_anon_client`) for Supabase Auth calls, so a user
+  signing in never swaps the session of the client that serves queries.
+
+Both are created lazily under a lock and sit on httpx connection pools with
+explicit limits, keep-alive and timeouts.  The pool transports count
+in-flight requests, so `pool_stats()` shows how close a worker gets to its
+connection limit when sizing gunicorn workers against the database.
+
+With `SUPABASE_BACKEND=memory` both accessors return a client for the
+in-process stand-in of `memory_backend` instead, so the API runs without a
+Supabase project.
+
+Clients are wrapped in a `TracedClient`, which counts and times the queries
+of each request (see `query_log`).
+"""
+
+import threading
+
+import httpx
+from supabase import create_client, ClientOptions
+
 from api.config import Config
+from api.services.memory_backend import MemoryClient, get_memory_database
+from api.services.query_log import TracedClient
+
+
+class PoolTransport(httpx.HTTPTransport):
+    """HTTP transport that tracks how many requests are in flight."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.max_connections = kwargs["limits"].max_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def handle_request(self, request):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return super().handle_request(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self):
+        connections = list(self._pool.connections)
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "max_connections": self.max_connections,
+            "connections": len(connections),
+            "idle_connections": idle,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests": self.requests,
+            "utilization": round(self.in_flight / self.max_connections, 4),
+        }
 
 
 class SupabaseService:
     def __init__(self):
         self.client = None
+        self.anon_client = None
+        self.transports = {}
+        self._lock = threading.Lock()
+
+    def _create(self, name, key):
+        if Config.SUPABASE_BACKEND == "memory":
+            return TracedClient(MemoryClient(get_memory_database()))
+        if not Config.SUPABASE_URL or not key:
+            raise RuntimeError("Supabase URL and key must be configured")
+        transport = PoolTransport(
+            limits=httpx.Limits(
+                max_connections=Config.SUPABASE_POOL_SIZE,
+                max_keepalive_connections=Config.SUPABASE_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=Config.SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            retries=1,
+        )
+        http_client = httpx.Client(
+            transport=transport,
+            timeout=httpx.Timeout(
+                Config.SUPABASE_TIMEOUT, connect=Config.SUPABASE_CONNECT_TIMEOUT
+            ),
+            follow_redirects=True,
+        )
+        options = ClientOptions(
+            httpx_client=http_client,
+            auto_refresh_token=False,
+            persist_session=False,
+        )
+        client = create_client(Config.SUPABASE_URL, key, options=options)
+        self.transports[name] = transport
+        return TracedClient(client)
 
     def get_client(self):
-        """Return a supabase client, creating it if necessary."""
+        """Return the service-role client, creating it if necessary."""
         if self.client is None:
-            if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
-                raise RuntimeError("Supabase URL and key must be configured")
-            self.client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+            with self._lock:
+                if self.client is None:
+                    self.client = self._create(
+                        "service", Config.SUPABASE_SERVICE_KEY or Config.SUPABASE_KEY
+                    )
         return self.client
 
+    def get_anon_client(self):
+        """Return the anon-key client used for Supabase Auth calls."""
+        if self.anon_client is None:
+            with self._lock:
+                if self.anon_client is None:
+                    self.anon_client = self._create(
+                        "anon", Config.SUPABASE_ANON_KEY or Config.SUPABASE_KEY
+                    )
+        return self.anon_client
+
     def get_user_from_token(self, token: str):
         """Verify a JWT token and return the associated user."""
-        client = self.get_client()
+        client = self.get_anon_client()
         return client.auth.get_user(token)
 
+    def pool_stats(self):
+        """Connection pool utilization per client that has been created."""
+        if Config.SUPABASE_BACKEND == "memory":
+            return {"memory": get_memory_database().stats()}
+        return {name: t.stats() for name, t in self.transports.items()}
+
 
 supabase_service = SupabaseService()
 
@@ -1,55 +1,55 @@
-import os
-import requests
-import logging
 from api.config import Config
+from api.services.cache import TTLCache
 from api.services.supabase_service import get_supabase_client
+from api.services.telegram_dispatcher import dispatcher
 
-TELEGRAM_API_URL = "https://api.telegram.org/bot{token}/{method}"
+ADMIN_RECIPIENTS_KEY = "admins"
+admin_recipients = TTLCache(maxsize=1, ttl=Config.ADMIN_RECIPIENTS_TTL, name="admin_recipients")
 
 
 def send_telegram_message(chat_id, message):
-    """Send a message to a Telegram chat id without raising errors."""
-    if not chat_id:
-        return
-    url = TELEGRAM_API_URL.format(token=Config.TELEGRAM_TOKEN, method="sendMessage")
-    payload = {"chat_id": chat_id, "text": message}
-    try:
-        resp = requests.post(url, json=payload, timeout=5)
-        if not resp.ok:
-            logging.error("Telegram API error %s: %s", resp.status_code, resp.text)
-    except Exception as exc:
-        logging.error("Failed to send telegram message: %s", exc)
-
-
-# legacy helpers
-def notify_admin_new_order(order_id, user_id, stall_id, total_amount):
-    """Legacy helper; sends to single admin chat from env var."""
-    chat_id = os.environ.get("TELEGRAM_ADMIN_CHAT")
+    """Queue a message to a Telegram chat id without raising errors.
+
+    Delivery happens on the dispatcher's worker threads, so this returns
+    immediately; failures are retried and logged there.
+    """
     if not chat_id:
         return
-    text = (
-        f"New order {order_id} from user {user_id} at stall {stall_id}: "
-        f"₹{total_amount:.2f}"
-    )
-    send_telegram_message(chat_id, text)
+    dispatcher.enqueue(chat_id, message)
 
 
-def notify_admins_new_order(order_id, user_name, stall_name, total_amount):
-    """Notify all admins with telegram_id about a new order."""
+def get_admin_chat_ids():
+    """Telegram ids of all admins, cached until a profile change invalidates it."""
+    return admin_recipients.get_or_load(ADMIN_RECIPIENTS_KEY, _load_admin_chat_ids)
+
+
+def _load_admin_chat_ids():
     client = get_supabase_client()
     res = (
         client.table('users')
         .select('telegram_id')
         .eq('role', 'admin')
-        .not_('telegram_id', None)
+        .not_.is_('telegram_id', 'null')
         .execute()
     )
-    admins = res.data or []
+    return [a.get('telegram_id') for a in (res.data or []) if a.get('telegram_id')]
+
+
+def invalidate_admin_recipients():
+    """Forget the cached admin list, e.g. after a telegram_id or role change."""
+    admin_recipients.delete(ADMIN_RECIPIENTS_KEY)
+
+
+def notify_admins_new_order(order_id, user_name, stall_name, total_amount):
+    """Notify all admins with telegram_id about a new order.
+
+    Messages are queued together and sent concurrently by the dispatcher,
+    within its worker cap and rate limit.
+    """
     message = (
         f"New order #{order_id} from {user_name} - {stall_name} - ₹{total_amount:.2f}"
     )
-    for admin in admins:
-        send_telegram_message(admin.get('telegram_id'), message)
+    dispatcher.enqueue_many(get_admin_chat_ids(), message)
 
 
 def notify_order_approved(user_telegram_id, order_id, estimated_time=None):
@@ -71,7 +71,7 @@ def notify_order_ready(user_telegram_id, order_id, stall_name):
 def notify_order_rejected(user_telegram_id, order_id, reason):
     if not user_telegram_id:
         return
-    msg = f"Your order #{order_id} was rejected. Reason: {reason}"
+    msg = f"Your order #{order_id} was rejected. Reason: {reason}."
     send_telegram_message(user_telegram_id, msg)
 
 
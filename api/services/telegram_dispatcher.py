@@ -0,0 +1,283 @@
+"""
+Telegram Dispatcher
+===================
+Background delivery of Telegram messages.
+
+Route handlers used to call the Bot API inline, so a slow Telegram stalled
+order creation and every status change.  Now they only `enqueue` a message
+and return; a small pool of worker threads delivers it.
+
+- The queue is bounded; when it is full new messages are dropped and
+  logged rather than blocking the request thread.
+- Each worker keeps its own `requests.Session`, so connections to the Bot
+  API are reused between messages.
+- Network errors and 5xx responses are retried with exponential backoff
+  through a delayed retry queue, without tying up a worker while waiting.
+- A 429 response pauses all workers for the `retry_after` seconds Telegram
+  asks for, since the rate limit applies to the whole bot.
+- The number of workers caps how many messages are in flight at once, and
+  a shared token bucket keeps the send rate under Telegram's per-bot limit
+  (about 30 messages per second) so fan-outs do not trigger 429s at all.
+"""
+
+import atexit
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.config import Config
+from api.services.metrics import telegram_send_duration
+from api.services.profiler import span
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket shared by all workers: `rate` sends/s, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a send is allowed."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class TelegramDispatcher:
+    """Bounded queue of outgoing messages drained by worker threads."""
+
+    def __init__(
+        self,
+        token=None,
+        api_url=None,
+        workers=4,
+        queue_size=1000,
+        max_retries=5,
+        backoff=1.0,
+        timeout=5.0,
+        rate_limit=30,
+    ):
+        self.token = token
+        self.api_url = api_url or "https://api.telegram.org"
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate_limit)
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._retries = []  # heap of (due, seq, job)
+        self._retry_cond = threading.Condition()
+        self._seq = itertools.count()
+        self._resume_at = 0.0
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retried = 0
+
+    # ── lifecycle ────────────────────────────────
+
+    def start(self):
+        """Start the worker and retry-scheduler threads (idempotent)."""
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            threads = [
+                threading.Thread(target=self._work, name=f"telegram-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            threads.append(
+                threading.Thread(target=self._schedule_retries, name="telegram-retry", daemon=True)
+            )
+            for thread in threads:
+                thread.start()
+            self._threads = threads
+
+    def flush(self, timeout=None):
+        """Wait until every queued and retrying message is settled.
+
+        Returns False if `timeout` seconds passed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks or self._retries:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout=5.0):
+        """Flush pending messages and stop the threads."""
+        self.flush(timeout)
+        self._stopping.set()
+        with self._retry_cond:
+            self._retry_cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+    # ── producer side ────────────────────────────
+
+    def enqueue(self, chat_id, text):
+        """Queue a message for delivery; returns False if it was dropped."""
+        if not chat_id:
+            return False
+        self.start()
+        job = {"chat_id": chat_id, "text": text, "attempt": 0}
+        with span("telegram", "enqueue"):
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.dropped += 1
+                logger.error("Telegram queue full, dropping message to %s", chat_id)
+                return False
+        return True
+
+    def enqueue_many(self, chat_ids, text):
+        """Queue the same message to several chats; returns how many were queued."""
+        return sum(1 for chat_id in chat_ids if self.enqueue(chat_id, text))
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "retry_depth": len(self._retries),
+            "threads": len(self._threads),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retried": self.retried,
+        }
+
+    # ── worker side ──────────────────────────────
+
+    def _session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _work(self):
+        session = self._session()
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                pause = self._resume_at - time.monotonic()
+                if pause > 0:
+                    time.sleep(pause)
+                self.limiter.acquire()
+                self._deliver(session, job)
+            except Exception:
+                logger.exception("Unexpected error delivering telegram message")
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, session, job):
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        payload = {"chat_id": job["chat_id"], "text": job["text"]}
+        start = time.perf_counter()
+        try:
+            resp = session.post(url, json=payload, timeout=self.timeout)
+        except requests.RequestException as exc:
+            telegram_send_duration.observe(time.perf_counter() - start, "network_error")
+            self._retry(job, f"request failed: {exc}")
+            return
+        telegram_send_duration.observe(time.perf_counter() - start, str(resp.status_code))
+
+        if resp.ok:
+            self.sent += 1
+            return
+        if resp.status_code == 429:
+            retry_after = self._retry_after(resp)
+            self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+            self._retry(job, "rate limited", delay=retry_after)
+            return
+        if resp.status_code >= 500:
+            self._retry(job, f"server error {resp.status_code}")
+            return
+        # other 4xx (bad chat id, bot blocked, ...) will not succeed on retry
+        self.failed += 1
+        logger.error("Telegram API error %s: %s", resp.status_code, resp.text)
+
+    def _retry_after(self, resp):
+        try:
+            return float(resp.json()["parameters"]["retry_after"])
+        except Exception:
+            return self.backoff
+
+    def _retry(self, job, reason, delay=None):
+        job["attempt"] += 1
+        if job["attempt"] > self.max_retries:
+            self.failed += 1
+            logger.error("Giving up on telegram message to %s: %s", job["chat_id"], reason)
+            return
+        if delay is None:
+            delay = self.backoff * 2 ** (job["attempt"] - 1)
+        self.retried += 1
+        with self._retry_cond:
+            heapq.heappush(self._retries, (time.monotonic() + delay, next(self._seq), job))
+            self._retry_cond.notify()
+
+    def _schedule_retries(self):
+        """Move retries back onto the main queue once they are due."""
+        with self._retry_cond:
+            while not self._stopping.is_set():
+                if not self._retries:
+                    self._retry_cond.wait(timeout=1.0)
+                    continue
+                due, _, job = self._retries[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._retry_cond.wait(timeout=wait)
+                    continue
+                try:
+                    self._queue.put_nowait(job)
+                except queue.Full:
+                    self.dropped += 1
+                    logger.error("Telegram queue full, dropping retry to %s", job["chat_id"])
+                heapq.heappop(self._retries)
+
+
+dispatcher = TelegramDispatcher(
+    token=Config.TELEGRAM_TOKEN,
+    api_url=Config.TELEGRAM_API_URL,
+    workers=Config.TELEGRAM_WORKERS,
+    queue_size=Config.TELEGRAM_QUEUE_SIZE,
+    max_retries=Config.TELEGRAM_MAX_RETRIES,
+    backoff=Config.TELEGRAM_RETRY_BACKOFF,
+    timeout=Config.TELEGRAM_TIMEOUT,
+    rate_limit=Config.TELEGRAM_RATE_LIMIT,
+)
+
+# give queued notifications a moment to go out when the worker exits
+atexit.register(dispatcher.flush, 2.0)
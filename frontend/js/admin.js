@@ -26,8 +26,9 @@ async function loadAdminOrders() {
   const el = document.getElementById('admin-orders-list');
   if (!el) return;
   try {
-    const orders = await apiRequest(API_ENDPOINTS.adminOrders);
-    el.innerHTML = (orders||[]).map(o => `
+    const data = await apiRequest(API_ENDPOINTS.adminOrders);
+    const orders = Array.isArray(data) ? data : (data.orders || []);
+    el.innerHTML = orders.map(o => `
       <div class="card mb-2"><div class="card-body">
         <h6>Order #${o.id}</h6>
         <p class="mb-0">User: ${o.user?.name || 'N/A'}</p>
@@ -0,0 +1,6 @@
+import os
+
+# the tests never reach a Supabase project: serve every query from the
+# in-process stand-in, with only the demo seed data
+os.environ.setdefault("SUPABASE_BACKEND", "memory")
+os.environ.setdefault("SUPABASE_MEMORY_SEED", "demo")
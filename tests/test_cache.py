@@ -0,0 +1,57 @@
+"""TTLCache never stores a value loaded across an invalidation."""
+
+import threading
+
+from api.services.cache import TTLCache
+
+
+def slow_loader(value, started, proceed):
+    def load():
+        started.set()
+        proceed.wait(5)
+        return value
+
+    return load
+
+
+def load_in_background(cache, key, loader):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=cache.get_or_load(key, loader)))
+    thread.start()
+    return thread, result
+
+
+def run_with_invalidation(invalidate):
+    cache = TTLCache(ttl=60)
+    started, proceed = threading.Event(), threading.Event()
+    thread, result = load_in_background(
+        cache, "menu:stalls", slow_loader("before the write", started, proceed)
+    )
+    assert started.wait(5)
+    invalidate(cache)  # an admin write lands while the loader runs
+    proceed.set()
+    thread.join()
+    return cache, result
+
+
+def test_value_loaded_across_a_delete_is_not_cached():
+    cache, result = run_with_invalidation(lambda c: c.delete("menu:stalls"))
+    # the caller that loaded still gets its value, but nobody else does
+    assert result["value"] == "before the write"
+    assert cache.get("menu:stalls") is None
+    assert cache.get_or_load("menu:stalls", lambda: "after the write") == "after the write"
+    assert cache.get("menu:stalls") == "after the write"
+
+
+def test_delete_prefix_and_clear_also_invalidate_loads():
+    for invalidate in (lambda c: c.delete_prefix("menu:"), lambda c: c.clear()):
+        cache, _ = run_with_invalidation(invalidate)
+        assert cache.get("menu:stalls") is None
+
+
+def test_loads_without_invalidation_are_cached():
+    cache = TTLCache(ttl=60)
+    calls = []
+    assert cache.get_or_load("k", lambda: calls.append(1) or "v") == "v"
+    assert cache.get_or_load("k", lambda: calls.append(1) or "other") == "v"
+    assert len(calls) == 1
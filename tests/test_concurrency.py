@@ -0,0 +1,72 @@
+"""run_concurrently timeouts, and their 503 at the HTTP layer."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api.app import create_app
+from api.services import concurrency
+from api.services.concurrency import ConcurrencyTimeout, QueryTimeout, run_concurrently
+
+
+def sleeper(seconds, result=None):
+    def call():
+        time.sleep(seconds)
+        return result
+
+    return call
+
+
+@pytest.fixture
+def one_thread_pool(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(concurrency, "_pool", pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_returns_results_by_name():
+    assert run_concurrently({"a": lambda: 1, "b": lambda: 2}) == {"a": 1, "b": 2}
+
+
+def test_time_queued_for_the_pool_does_not_count(one_thread_pool):
+    # run back to back: the second ends 0.4s after submission, 0.2s after it started
+    calls = {"first": sleeper(0.2, 1), "second": sleeper(0.2, 2)}
+    assert run_concurrently(calls, timeout=0.3) == {"first": 1, "second": 2}
+
+
+def test_a_call_running_too_long_times_out():
+    started = time.monotonic()
+    with pytest.raises(QueryTimeout, match="slow"):
+        run_concurrently({"fast": sleeper(0), "slow": sleeper(1)}, timeout=0.1)
+    assert time.monotonic() - started < 0.5
+
+
+def test_calls_stuck_in_the_queue_time_out(one_thread_pool):
+    # another request's query holds the only pool thread well past the deadline
+    one_thread_pool.submit(time.sleep, 1)
+    started = time.monotonic()
+    with pytest.raises(ConcurrencyTimeout, match="a, b still waiting"):
+        run_concurrently({"a": sleeper(0), "b": sleeper(0)}, timeout=0.1)
+    assert time.monotonic() - started < 0.5
+
+
+def test_errors_are_raised():
+    def broken():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        run_concurrently({"ok": sleeper(0), "broken": broken})
+
+
+def test_query_timeout_is_a_503():
+    app = create_app()
+
+    @app.route("/slow")
+    def slow():
+        raise QueryTimeout("stall did not finish within 10s of starting")
+
+    res = app.test_client().get("/slow")
+    assert res.status_code == 503
+    assert "error" in res.get_json()
@@ -0,0 +1,49 @@
+"""Open streams and long-polls are capped per process with a 503."""
+
+import pytest
+
+from api.app import create_app
+from api.config import Config
+from api.services.events import hub
+from api.services.memory_backend import get_memory_database
+
+PASSWORD = "pw-123456"
+
+
+@pytest.fixture(scope="module")
+def client():
+    db = get_memory_database()
+    db.create_user("live-student@example.com", PASSWORD, "Live Student")
+    return create_app().test_client()
+
+
+@pytest.fixture
+def headers(client):
+    session = get_memory_database().auth.sign_in_with_password(
+        {"email": "live-student@example.com", "password": PASSWORD}
+    )["session"]
+    return {"Authorization": f"Bearer {session['access_token']}"}
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(hub, "max_subscribers", len(hub._subscribers) + 1)
+
+
+def test_stream_over_the_limit_gets_503(client, headers, one_slot):
+    first = client.get("/orders/stream", headers=headers, buffered=False)
+    assert first.status_code == 200
+
+    second = client.get("/orders/stream", headers=headers, buffered=False)
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == str(Config.EVENT_RETRY_AFTER)
+    assert client.get("/orders/events?timeout=0", headers=headers).status_code == 503
+
+    # closing the first stream, even unread, frees its slot
+    first.close()
+    assert client.get("/orders/events?timeout=0", headers=headers).status_code == 200
+
+
+def test_long_poll_releases_its_slot(client, headers, one_slot):
+    for _ in range(3):
+        assert client.get("/orders/events?timeout=0", headers=headers).status_code == 200
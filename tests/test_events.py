@@ -0,0 +1,35 @@
+"""Long-polls never lose an event between two polls."""
+
+from api.services.events import EventHub, poll_events
+from api.services import events
+
+
+def test_event_published_after_the_wait_is_in_the_next_poll(monkeypatch):
+    hub = EventHub()
+    monkeypatch.setattr(events, "hub", hub)
+    hub.publish(["admin"], "order.created", {"id": 1})
+
+    # a client's first poll; an event lands after the wait timed out but
+    # before the poll returns
+    unsubscribe = hub.unsubscribe
+
+    def late_unsubscribe(sub):
+        hub.publish(["admin"], "order.created", {"id": 2})
+        unsubscribe(sub)
+
+    monkeypatch.setattr(hub, "unsubscribe", late_unsubscribe)
+    second = poll_events(["admin"], None, timeout=0)
+    assert second["events"] == []
+    monkeypatch.setattr(hub, "unsubscribe", unsubscribe)
+
+    third = poll_events(["admin"], second["last_event_id"], timeout=0)
+    assert [e["data"]["id"] for e in third["events"]] == [2]
+
+
+def test_first_poll_on_an_empty_hub_resumes_from_the_start(monkeypatch):
+    hub = EventHub()
+    monkeypatch.setattr(events, "hub", hub)
+    first = poll_events(["admin"], None, timeout=0)
+    hub.publish(["admin"], "order.created", {"id": 1})
+    second = poll_events(["admin"], first["last_event_id"], timeout=0)
+    assert [e["data"]["id"] for e in second["events"]] == [1]
@@ -0,0 +1,45 @@
+"""StockIndex reloads once when many checkouts find it stale."""
+
+import threading
+import time
+
+from api.services import inventory
+from api.services.inventory import StockIndex
+
+
+class CountingClient:
+    """Answers the stock reload slowly and counts how often it is asked."""
+
+    def __init__(self):
+        self.loads = 0
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        return self
+
+    def execute(self):
+        self.loads += 1
+        time.sleep(0.1)
+        return type("Response", (), {"data": [{"id": 1, "stock": 5}]})()
+
+
+def test_concurrent_stale_checks_reload_once(monkeypatch):
+    client = CountingClient()
+    monkeypatch.setattr(inventory.supabase_service, "get_client", lambda: client)
+    index = StockIndex(refresh_ttl=60)
+    barrier = threading.Barrier(8)
+
+    def checkout():
+        barrier.wait()
+        index.release(index.reserve([{"menu_item_id": 1, "quantity": 1}]))
+
+    threads = [threading.Thread(target=checkout) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert client.loads == 1
+    assert index.available(1) == 5
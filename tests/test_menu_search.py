@@ -0,0 +1,95 @@
+"""MenuSearchIndex keeps admin changes made while it rebuilds."""
+
+import threading
+
+from api.services import menu_search
+from api.services.menu_search import MenuSearchIndex
+
+STALLS = {1: "South Indian Corner"}
+
+
+def row(item_id, name, **extra):
+    return {"id": item_id, "stall_id": 1, "name": name, "is_available": True, **extra}
+
+
+class MenuClient:
+    """Serves menu rows; `during_fetch` runs once, after the items were read."""
+
+    def __init__(self, rows):
+        self.rows = {r["id"]: r for r in rows}
+        self.during_fetch = None
+
+    def table(self, name):
+        self.name = name
+        return self
+
+    def select(self, columns):
+        return self
+
+    def execute(self):
+        if self.name == "food_stalls":
+            data = [{"id": i, "name": n} for i, n in STALLS.items()]
+        else:
+            data = [dict(r) for r in self.rows.values()]
+            hook, self.during_fetch = self.during_fetch, None
+            if hook:
+                hook()
+        return type("Response", (), {"data": data})()
+
+
+def names(index, query):
+    return [r["name"] for r in index.search(query)]
+
+
+def refresh(index):
+    """Start a background refresh and wait for it to finish."""
+    index.refresh_ttl = 0
+    index.ensure_loaded()
+    for thread in threading.enumerate():
+        if thread.name == "menu-search-refresh":
+            thread.join()
+    index.refresh_ttl = 300
+
+
+def index_over(monkeypatch, rows):
+    client = MenuClient(rows)
+    monkeypatch.setattr(menu_search.supabase_service, "get_client", lambda: client)
+    index = MenuSearchIndex()
+    index.ensure_loaded()
+    return index, client
+
+
+def test_upsert_and_remove_update_the_index(monkeypatch):
+    index, _ = index_over(monkeypatch, [row(1, "Masala Dosa")])
+    index.upsert_item(row(2, "Onion Uttapam"))
+    assert names(index, "uttapam") == ["Onion Uttapam"]
+    index.remove_item(1)
+    assert names(index, "dosa") == []
+
+
+def test_changes_during_a_refresh_fetch_survive_it(monkeypatch):
+    index, client = index_over(monkeypatch, [row(1, "Masala Dosa"), row(2, "Plain Idli")])
+
+    def admin_edits():
+        # the menu changes after the refresh read its rows
+        for change in (row(1, "Ghee Roast Dosa"), row(3, "Filter Coffee")):
+            client.rows[change["id"]] = change
+            index.upsert_item(change)
+        del client.rows[2]
+        index.remove_item(2)
+
+    client.during_fetch = admin_edits
+    refresh(index)
+
+    assert names(index, "ghee") == ["Ghee Roast Dosa"]
+    assert names(index, "masala") == []
+    assert names(index, "coffee") == ["Filter Coffee"]
+    assert names(index, "idli") == []
+
+
+def test_a_later_refresh_does_not_replay_old_changes(monkeypatch):
+    index, _ = index_over(monkeypatch, [row(1, "Masala Dosa")])
+    # indexed here, but never saved
+    index.upsert_item(row(2, "Filter Coffee"))
+    refresh(index)
+    assert names(index, "coffee") == []
@@ -0,0 +1,112 @@
+"""Query counts of the main endpoints, served from the memory backend.
+
+Budgets are for a cold process (empty caches), so they hold in any test
+order.  Listing endpoints must cost the same however many orders they
+return: a query per order is the N+1 that `enrich_orders` removed.
+"""
+
+import pytest
+
+from api.app import create_app
+from api.config import Config
+from api.services.auth_service import invalidate_admin_roles
+from api.services.memory_backend import get_memory_database
+from api.services.query_log import query_budget
+
+PASSWORD = "pw-123456"
+ITEMS = [{"menu_item_id": 1, "quantity": 1}, {"menu_item_id": 2, "quantity": 2}]
+
+
+def _login(db, email):
+    session = db.auth.sign_in_with_password({"email": email, "password": PASSWORD})["session"]
+    return {"Authorization": f"Bearer {session['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def env():
+    db = get_memory_database()
+    db.create_user("budget-admin@example.com", PASSWORD, "Budget Admin", role="admin")
+    db.create_user("budget-student@example.com", PASSWORD, "Budget Student")
+    db.create_user("budget-export@example.com", PASSWORD, "Budget Export")
+    # the users were written behind the API's back
+    invalidate_admin_roles()
+    app = create_app()
+    return {
+        "client": app.test_client(),
+        "student": _login(db, "budget-student@example.com"),
+        "admin": _login(db, "budget-admin@example.com"),
+        "exporter": _login(db, "budget-export@example.com"),
+    }
+
+
+def _place_orders(env, n, who="student"):
+    for _ in range(n):
+        res = _call(env, "POST", "/orders", who, json={"stall_id": 1, "items": ITEMS})
+        assert res.status_code == 201
+    return res.get_json()["order_id"]
+
+
+def _call(env, method, path, who=None, **kwargs):
+    headers = env[who] if who else None
+    res = env["client"].open(path, method=method, headers=headers, **kwargs)
+    res.get_data()  # streamed bodies query while they are read
+    return res
+
+
+@pytest.mark.parametrize(
+    "method, path, who, budget",
+    [
+        ("GET", "/menu/stalls", None, 1),
+        ("GET", "/menu/stalls/1/items", None, 1),
+        ("GET", "/menu/items/1", None, 1),
+        ("GET", "/menu/search?q=dosa", None, 2),
+        ("GET", "/users/profile", "student", 2),
+        ("GET", "/orders", "student", 3),
+        ("GET", "/admin/orders/pending", "admin", 4),
+        ("GET", "/admin/orders", "admin", 4),
+        ("GET", "/admin/stats", "admin", 3),
+        ("GET", "/admin/stats?from=2020-01-01&to=2099-12-31&breakdown=stall", "admin", 3),
+    ],
+)
+def test_read_endpoints_stay_within_budget(env, method, path, who, budget):
+    _place_orders(env, 1)
+    with query_budget(budget) as log:
+        res = _call(env, method, path, who)
+    assert res.status_code == 200, res.get_json()
+    assert not log.repeated(), log.by_shape()
+
+
+def test_order_lifecycle_stays_within_budget(env):
+    with query_budget(3):
+        order_id = _place_orders(env, 1)
+    with query_budget(3):
+        assert _call(env, "GET", f"/orders/{order_id}", "student").status_code == 200
+    with query_budget(2):
+        res = _call(env, "POST", f"/admin/orders/{order_id}/approve", "admin", json={})
+    assert res.status_code == 200
+
+
+@pytest.mark.parametrize("path, who", [
+    ("/orders", "student"),
+    ("/admin/orders", "admin"),
+    ("/admin/orders/pending", "admin"),
+])
+def test_order_listings_do_not_grow_with_orders(env, path, who):
+    _place_orders(env, 2)
+    with query_budget(10) as few:
+        assert _call(env, "GET", path, who).status_code == 200
+    _place_orders(env, 25)
+    with query_budget(10) as many:
+        assert _call(env, "GET", path, who).status_code == 200
+    assert many.count == few.count, many.by_shape()
+    assert not many.repeated(), many.by_shape()
+
+
+def test_order_export_costs_a_fixed_number_of_queries_per_page(env, monkeypatch):
+    monkeypatch.setattr(Config, "ORDERS_EXPORT_PAGE_SIZE", 10)
+    _place_orders(env, 25, who="exporter")
+    # three pages, each one orders query plus the stall and item lookups
+    with query_budget(9):
+        res = _call(env, "GET", "/orders?format=ndjson", "exporter")
+    assert res.status_code == 200
+    assert len(res.get_data(as_text=True).splitlines()) == 25
@@ -0,0 +1,66 @@
+"""SSE routes authenticate browsers with single-use stream tickets."""
+
+import pytest
+
+from api.app import create_app
+from api.config import Config
+from api.services import auth_service
+from api.services.memory_backend import get_memory_database
+
+PASSWORD = "pw-123456"
+
+
+@pytest.fixture(scope="module")
+def client():
+    get_memory_database().create_user("ticket-student@example.com", PASSWORD, "Ticket Student")
+    return create_app().test_client()
+
+
+@pytest.fixture
+def token(client):
+    session = get_memory_database().auth.sign_in_with_password(
+        {"email": "ticket-student@example.com", "password": PASSWORD}
+    )["session"]
+    return session["access_token"]
+
+
+def _ticket(client, token):
+    res = client.post("/auth/stream-ticket", headers={"Authorization": f"Bearer {token}"})
+    assert res.status_code == 200
+    return res.get_json()["ticket"]
+
+
+def _open(client, query):
+    res = client.get(f"/orders/stream?{query}", headers={"Accept": "text/event-stream"},
+                     buffered=False)
+    res.close()
+    return res.status_code
+
+
+def test_ticket_opens_one_stream(client, token):
+    ticket = _ticket(client, token)
+    assert _open(client, f"ticket={ticket}") == 200
+    assert _open(client, f"ticket={ticket}") == 401
+
+
+def test_bearer_token_in_the_url_is_refused(client, token):
+    assert _open(client, f"access_token={token}") == 401
+
+
+def test_ticket_only_works_on_stream_routes(client, token):
+    ticket = _ticket(client, token)
+    assert client.get(f"/orders?ticket={ticket}").status_code == 401
+    assert client.get(f"/orders/events?timeout=0&ticket={ticket}").status_code == 401
+
+
+def test_expired_or_forged_tickets_are_refused(client, token, monkeypatch):
+    payload, signature = _ticket(client, token).split(".")
+    assert _open(client, f"ticket={payload}.{signature[::-1]}") == 401
+
+    monkeypatch.setattr(Config, "STREAM_TICKET_TTL", -1)
+    assert _open(client, f"ticket={_ticket(client, token)}") == 401
+
+
+def test_tickets_need_authentication(client):
+    assert client.post("/auth/stream-ticket").status_code == 401
+    assert auth_service.redeem_stream_ticket("not-a-ticket") is None
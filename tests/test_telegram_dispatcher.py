@@ -0,0 +1,177 @@
+"""TelegramDispatcher against a stub Bot API served on localhost."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api.services.telegram_dispatcher import TelegramDispatcher
+
+
+class StubTelegram:
+    """sendMessage endpoint answering from a per-chat script of responses.
+
+    `script[chat_id]` is a list of `(status, body)`; the last one repeats.
+    Chats without a script get 200.  Requests wait on `gate` while it is
+    cleared.
+    """
+
+    def __init__(self):
+        self.script = {}
+        self.calls = []  # (monotonic time, chat_id)
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                chat_id = body["chat_id"]
+                with stub._lock:
+                    stub.calls.append((time.monotonic(), chat_id))
+                    attempt = sum(1 for _, c in stub.calls if c == chat_id) - 1
+                    responses = stub.script.get(chat_id, [(200, {"ok": True})])
+                status, payload = responses[min(attempt, len(responses) - 1)]
+                stub.gate.wait(5)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def times(self, chat_id):
+        return [t for t, c in self.calls if c == chat_id]
+
+    def wait_for_calls(self, n, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.calls) < n and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return len(self.calls) >= n
+
+    def close(self):
+        self.gate.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubTelegram()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def make_dispatcher(stub):
+    dispatchers = []
+
+    def make(**options):
+        options = {"workers": 4, "rate_limit": 0, "backoff": 0.05, "timeout": 5, **options}
+        d = TelegramDispatcher(token="test-token", api_url=stub.url, **options)
+        dispatchers.append(d)
+        return d
+
+    yield make
+    for d in dispatchers:
+        d.stop(timeout=1)
+
+
+def rate_limited(retry_after):
+    return 429, {"ok": False, "error_code": 429, "parameters": {"retry_after": retry_after}}
+
+
+SERVER_ERROR = (500, {"ok": False, "error_code": 500})
+
+
+def test_delivers_every_message(stub, make_dispatcher):
+    d = make_dispatcher()
+    assert d.enqueue_many(["1", "2", "3"], "hello") == 3
+    assert d.flush(5)
+    assert sorted(c for _, c in stub.calls) == ["1", "2", "3"]
+    assert d.stats()["sent"] == 3
+
+
+def test_send_rate_is_limited(stub, make_dispatcher):
+    # a burst of 20, then 20 per second: 40 messages take at least a second
+    d = make_dispatcher(rate_limit=20, workers=8)
+    start = time.monotonic()
+    d.enqueue_many([str(i) for i in range(40)], "fan-out")
+    assert d.flush(10)
+    assert d.stats()["sent"] == 40
+    assert time.monotonic() - start >= 0.95
+    first = min(t for t, _ in stub.calls)
+    in_first_half_second = sum(1 for t, _ in stub.calls if t - first < 0.5)
+    assert in_first_half_second <= 20 + 20 * 0.5 + 1
+
+
+def test_429_pauses_all_workers_for_retry_after(stub, make_dispatcher):
+    stub.script["slow"] = [rate_limited(0.4), (200, {"ok": True})]
+    d = make_dispatcher(workers=2)
+    d.enqueue("slow", "first")
+    assert stub.wait_for_calls(1)
+    limited_at = stub.times("slow")[0]
+    # hold back until the 429 has been read by the worker
+    time.sleep(0.05)
+    d.enqueue("other", "second")
+    assert d.flush(5)
+
+    retried_at = stub.times("slow")[1]
+    assert retried_at - limited_at >= 0.35
+    assert stub.times("other")[0] - limited_at >= 0.35
+    assert d.stats()["sent"] == 2
+    assert d.stats()["retried"] == 1
+
+
+def test_5xx_is_retried_with_backoff_then_given_up(stub, make_dispatcher):
+    stub.script["broken"] = [SERVER_ERROR]
+    d = make_dispatcher(max_retries=2, backoff=0.1)
+    d.enqueue("broken", "never arrives")
+    assert d.flush(5)
+
+    times = stub.times("broken")
+    assert len(times) == 3
+    assert times[1] - times[0] >= 0.09
+    assert times[2] - times[1] >= 0.19
+    stats = d.stats()
+    assert (stats["sent"], stats["failed"], stats["retried"]) == (0, 1, 2)
+
+
+def test_5xx_then_success(stub, make_dispatcher):
+    stub.script["flaky"] = [SERVER_ERROR, (200, {"ok": True})]
+    d = make_dispatcher()
+    d.enqueue("flaky", "eventually")
+    assert d.flush(5)
+    assert len(stub.times("flaky")) == 2
+    assert d.stats()["sent"] == 1
+
+
+def test_drops_new_messages_when_the_queue_is_full(stub, make_dispatcher):
+    stub.gate.clear()
+    d = make_dispatcher(workers=1, queue_size=2)
+    assert d.enqueue("busy", "in flight")
+    assert stub.wait_for_calls(1)
+
+    assert d.enqueue("a", "queued")
+    assert d.enqueue("b", "queued")
+    started = time.monotonic()
+    assert d.enqueue("c", "no room") is False
+    # dropping must not block the caller
+    assert time.monotonic() - started < 0.1
+    assert d.stats()["dropped"] == 1
+
+    stub.gate.set()
+    assert d.flush(5)
+    assert sorted(c for _, c in stub.calls) == ["a", "b", "busy"]
+    assert d.stats()["sent"] == 3